@@ -1,8 +1,7 @@
 #!/usr/bin/env python3
 from pathlib import Path
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
+from salida_excel import COLORES_FALLA, reemplazar_hoja
 
 # ================= RUTAS =================
 BASE = Path("/Users/joseluisgiadanscastellanos/Library/CloudStorage/OneDrive-CEMEX/OneDrive_Cemex")
@@ -41,23 +40,13 @@ def diag_3ratios(row):
         diag = "T1 (<300°C)"
     return round(R1,2), round(R2,2), round(R3,2), diag
 
-# ================= MAIN =================
-def main():
-    if not OUT_FILE.exists():
-        print(f"❌ No encuentro el archivo: {OUT_FILE}")
-        return
-
-    # Leer hoja UltimaPorTrafo
-    df = pd.read_excel(OUT_FILE, sheet_name="UltimaPorTrafo")
+HOJA = "Diag_3Ratios"
+COLS_COLOR = ["Diagnóstico 3 Ratios"]
+COLORES = COLORES_FALLA
+NEEDED = ["CH4", "C2H4", "C2H6", "C2H2", "H2"]
 
-    # Asegurar columnas
-    needed = ["CH4","C2H4","C2H6","C2H2","H2"]
-    for col in needed:
-        if col not in df.columns:
-            print(f"❌ Falta columna {col} en UltimaPorTrafo")
-            return
-
-    # Calcular ratios y diagnóstico
+def calcular(df: pd.DataFrame) -> pd.DataFrame:
+    """Hoja 'Diag_3Ratios' (ratios y diagnóstico) a partir de UltimaPorTrafo."""
     results = []
     for _, row in df.iterrows():
         R1, R2, R3, diag = diag_3ratios(row)
@@ -71,48 +60,29 @@ def main():
             "R3 (C2H4/C2H6)": R3,
             "Diagnóstico 3 Ratios": diag
         })
-    out_df = pd.DataFrame(results)
+    return pd.DataFrame(results)
 
-    # Guardar como tabla en hoja nueva
-    with pd.ExcelWriter(OUT_FILE, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
-        out_df.to_excel(writer, index=False, sheet_name="Diag_3Ratios")
-
-    # Volvemos a abrir con openpyxl para añadir formato
-    wb = load_workbook(OUT_FILE)
-    ws = wb["Diag_3Ratios"]
+# ================= MAIN =================
+def main():
+    if not OUT_FILE.exists():
+        print(f"❌ No encuentro el archivo: {OUT_FILE}")
+        return
 
-    # ----- Convertir en tabla estilo Excel -----
-    nrows, ncols = out_df.shape
-    from openpyxl.worksheet.table import Table, TableStyleInfo
-    table = Table(displayName="Tabla3Ratios", ref=f"A1:H{nrows+1}")
-    style = TableStyleInfo(name="TableStyleMedium9", showFirstColumn=False,
-                           showLastColumn=False, showRowStripes=True, showColumnStripes=False)
-    table.tableStyleInfo = style
-    ws.add_table(table)
+    # Leer hoja UltimaPorTrafo
+    df = pd.read_excel(OUT_FILE, sheet_name="UltimaPorTrafo")
 
-    # ----- Colorear columna de diagnóstico -----
-    col_diag = None
-    for i, cell in enumerate(ws[1], start=1):
-        if cell.value == "Diagnóstico 3 Ratios":
-            col_diag = i
-            break
+    # Asegurar columnas
+    for col in NEEDED:
+        if col not in df.columns:
+            print(f"❌ Falta columna {col} en UltimaPorTrafo")
+            return
 
-    if col_diag:
-        for r in range(2, ws.max_row+1):
-            val = str(ws.cell(r, col_diag).value or "")
-            if "T1" in val:
-                fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid") # Verde
-            elif "T2" in val:
-                fill = PatternFill(start_color="FFF2CC", end_color="FFF2CC", fill_type="solid") # Amarillo
-            elif any(x in val for x in ["T3","D2","DT"]):
-                fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid") # Rojo
-            else:
-                fill = None
-            if fill:
-                ws.cell(r, col_diag).fill = fill
+    # Calcular ratios y diagnóstico
+    out_df = calcular(df)
 
-    wb.save(OUT_FILE)
+    # Guardar como tabla, con colores por rango en la columna de diagnóstico
+    reemplazar_hoja(OUT_FILE, HOJA, out_df, COLS_COLOR, COLORES, tabla="Tabla3Ratios")
     print(f"✅ Hoja 'Diag_3Ratios' añadida como tabla con colores a {OUT_FILE}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+import hashlib, json, math, sqlite3, sys, threading
+import pandas as pd
+import pyarrow as pa
+from datos import (leer_hojas, unir_diagnosticos, a_arrow, leer_arrow, filtrar_arrow,
+                   listar_arrow, consultar_muestras, snapshot_vigente, plantas_particionadas, leer_particion,
+                   particiones_vigentes, version_archivos, APP_DATA, SNAP_DIR)
+
+# ================= RUTAS =================
+DATA_DIR = APP_DATA
+XLSX = "trafos_maestro_tabla.xlsx"
+
+# ================= CONFIG =================
+HOST, PUERTO = "127.0.0.1", 8502
+POR_PAGINA, MAX_POR_PAGINA = 500, 5000
+MAX_RESPUESTAS = 512   # respuestas memorizadas por versión de datos
+TIPOS = {"json": "application/json; charset=utf-8", "csv": "text/csv; charset=utf-8"}
+RUTAS = ("/flota", "/historial", "/plantas", "/version")
+
+# Estado compartido entre hilos: se rehace entero cuando cambia la versión de datos
+_lock = threading.Lock()       # solo para leer/cambiar _estado: nunca se retiene mientras se carga algo
+_carga = threading.Lock()      # un solo hilo arma la versión nueva
+_estado = {"version": None, "carpeta": None, "tabla": None, "datos": None, "respuestas": {}}
+
+# ================= VERSIÓN DE DATOS =================
+def version_datos():
+    """(carpeta, versión): número de snapshot si publicar.py está activo; si no, el mtime
+    de los archivos de data/. Es barato: no abre ningún archivo de datos."""
+    carpeta, v = snapshot_vigente(SNAP_DIR, DATA_DIR)
+    return carpeta, f"v{v}" if v is not None else version_archivos(carpeta)
+
+def _cargar_tabla(carpeta: Path) -> pa.Table:
+    if (carpeta / "trafos.arrow").exists():
+        return leer_arrow(carpeta / "trafos.arrow")
+    particiones = particiones_vigentes(carpeta / "particiones")
+    if particiones.is_dir():
+        return pa.concat_tables([leer_particion(particiones, p) for p in plantas_particionadas(particiones)])
+    return a_arrow(unir_diagnosticos(leer_hojas(carpeta / XLSX)))
+
+def _vigente():
+    """Estado de la versión actual; al cambiar de versión se descarta todo lo memorizado.
+
+    La versión nueva se arma fuera de `_lock` y se intercambia al final: mientras
+    tanto los demás hilos siguen respondiendo (y dando 304) con la anterior.
+    """
+    carpeta, version = version_datos()
+    with _lock:
+        if _estado["version"] == version:
+            return dict(_estado)
+        anterior = dict(_estado)
+    # Sin versión anterior no hay nada que servir: se espera a la carga en curso
+    if not _carga.acquire(blocking=anterior["version"] is None):
+        return anterior
+    try:
+        with _lock:
+            if _estado["version"] == version:
+                return dict(_estado)
+        nuevo = {"version": version, "carpeta": carpeta, "tabla": _cargar_tabla(carpeta), "datos": None, "respuestas": {}}
+        precalcular(nuevo)
+        with _lock:
+            _estado.update(nuevo)
+        print(f"📦 Datos {version} cargados desde {carpeta} ({nuevo['tabla'].num_rows} trafos)")
+        return nuevo
+    finally:
+        _carga.release()
+
+# ================= RESPUESTAS =================
+def _pagina(df: pd.DataFrame, params: dict):
+    total = len(df)
+    size = min(max(int(params.get("size", [POR_PAGINA])[0]), 1), MAX_POR_PAGINA)
+    page = max(int(params.get("page", [1])[0]), 1)
+    pages = max(math.ceil(total / size), 1)
+    return df.iloc[(page - 1) * size: page * size], {"total": total, "page": page, "size": size, "pages": pages}
+
+def _cuerpo(df: pd.DataFrame, meta: dict, fmt: str) -> bytes:
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    items = df.to_json(orient="records", force_ascii=False, date_format="iso")
+    return (json.dumps(meta, ensure_ascii=False)[:-1] + f', "items": {items}}}').encode("utf-8")
+
+def _historial(est: dict, params: dict) -> pd.DataFrame:
+    planta, trafo = params["planta"][0], params["transformador"][0]
+    ubicacion = params.get("ubicacion", [None])[0]
+    db = est["carpeta"] / "trafos.sqlite"
+    if db.exists():
+        try:
+            return consultar_muestras(db, planta, trafo, ubicacion)
+        except sqlite3.OperationalError:
+            pass  # base sin tabla `muestras`: se usa la hoja Datos
+    with _lock:
+        datos = _estado["datos"] if _estado["version"] == est["version"] else None
+    if datos is None:
+        # Se lee fuera del candado; si otro hilo lo leyó a la vez, queda el primero
+        datos = pd.read_excel(est["carpeta"] / XLSX, sheet_name="Datos")
+        with _lock:
+            if _estado["version"] == est["version"] and _estado["datos"] is None:
+                _estado["datos"] = datos
+    m = (datos["Planta"].astype(str) == planta) & (datos["Transformador"].astype(str) == trafo)
+    if ubicacion is not None:
+        m &= datos["Ubicacion"].astype(str) == ubicacion
+    return datos[m].drop(columns=[c for c in datos.columns if str(c).startswith("_")])
+
+def validar(ruta: str, params: dict):
+    """ValueError si los parámetros no sirven para `ruta` (ya conocida).
+
+    Se valida antes de comparar ETags: un 304 solo reemplaza a una respuesta 200.
+    """
+    if params["format"][0] not in TIPOS:
+        raise ValueError("format debe ser json o csv")
+    try:
+        for k in ("page", "size"):
+            if k in params:
+                int(params[k][0])
+    except ValueError:
+        raise ValueError("page y size deben ser enteros")
+    if ruta == "/historial" and not ("planta" in params and "transformador" in params):
+        raise ValueError("'planta' y 'transformador' son obligatorios")
+
+def _consulta(ruta: str, params: dict, est: dict) -> pd.DataFrame:
+    """Filas completas (sin paginar) de /flota o /historial."""
+    if ruta == "/flota":
+        return filtrar_arrow(est["tabla"], params.get("planta"), params.get("estado"))
+    return _historial(est, params)
+
+def _paginada(df: pd.DataFrame, params: dict, est: dict) -> tuple:
+    fmt = params["format"][0]
+    parte, meta = _pagina(df, params)
+    # En CSV la paginación solo viaja en cabeceras
+    cabeceras = {"X-Total-Count": meta["total"], "X-Page": meta["page"], "X-Pages": meta["pages"]}
+    return 200, TIPOS[fmt], _cuerpo(parte, {"version": est["version"], **meta}, fmt), cabeceras
+
+def responder(ruta: str, params: dict, est: dict) -> tuple:
+    """(status, tipo, cuerpo, cabeceras) para la ruta, calculado sobre la versión `est`."""
+    if ruta == "/version":
+        return 200, TIPOS["json"], json.dumps({"version": est["version"]}).encode(), {}
+    if ruta == "/plantas":
+        return 200, TIPOS["json"], json.dumps(listar_arrow(est["tabla"], "Planta"), ensure_ascii=False).encode("utf-8"), {}
+    return _paginada(_consulta(ruta, params, est), params, est)
+
+def _clave(ruta: str, params: dict) -> str:
+    return ruta + "?" + "&".join(f"{k}={v}" for k in sorted(params) for v in params[k])
+
+def _etag(version: str, clave: str) -> str:
+    return f'"{version}-{hashlib.sha1(clave.encode("utf-8")).hexdigest()[:16]}"'
+
+def _coincide(if_none_match: str, etag: str) -> bool:
+    etiquetas = [t.strip().removeprefix("W/") for t in (if_none_match or "").split(",")]
+    return "*" in etiquetas or etag in etiquetas
+
+def precalcular(est: dict):
+    """Todas las páginas de /flota sin filtros (JSON y CSV) para la versión `est`.
+
+    La tabla se pasa a pandas una sola vez y cada página es un corte de ese resultado.
+    """
+    df = _consulta("/flota", {}, est)
+    pages = max(math.ceil(len(df) / POR_PAGINA), 1)
+    for fmt in TIPOS:
+        for page in range(1, pages + 1):
+            params = {"format": [fmt], "page": [str(page)]}
+            est["respuestas"][_clave("/flota", params)] = _paginada(df, params, est)
+
+# ================= SERVIDOR =================
+class Handler(BaseHTTPRequestHandler):
+    server_version = "TrafosAPI/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        ruta = url.path.rstrip("/") or "/"
+        params = parse_qs(url.query)
+        params.setdefault("format", ["json"])
+        params.setdefault("page", ["1"])
+        if ruta not in RUTAS:
+            return self._enviar(404, TIPOS["json"], b'{"error": "ruta no encontrada"}')
+        try:
+            validar(ruta, params)
+        except ValueError as e:
+            return self._enviar(400, TIPOS["json"], json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8"))
+        try:
+            est = _vigente()
+            clave = _clave(ruta, params)
+            etag = _etag(est["version"], clave)
+            # La versión y los parámetros definen el ETag: un sondeo sin cambios no recalcula nada
+            if _coincide(self.headers.get("If-None-Match"), etag):
+                return self._enviar(304, None, b"", etag, est["version"])
+            with _lock:
+                respuesta = est["respuestas"].get(clave)
+            if respuesta is None:
+                respuesta = responder(ruta, params, est)
+                with _lock:
+                    if len(est["respuestas"]) >= MAX_RESPUESTAS:
+                        est["respuestas"].clear()
+                    est["respuestas"][clave] = respuesta
+        except Exception as e:
+            # Sin datos publicados o archivo ilegible: el cliente reintenta más tarde
+            return self._enviar(503, TIPOS["json"], json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8"))
+        status, tipo, cuerpo, cabeceras = respuesta
+        self._enviar(status, tipo, cuerpo, etag, est["version"], cabeceras)
+
+    def _enviar(self, status, tipo, cuerpo: bytes, etag=None, version=None, cabeceras=None):
+        self.send_response(status)
+        for k, v in (cabeceras or {}).items():
+            self.send_header(k, str(v))
+        if tipo:
+            self.send_header("Content-Type", tipo)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")  # revalidar siempre; el 304 es barato
+        if version:
+            self.send_header("X-Data-Version", version)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        if cuerpo:
+            self.wfile.write(cuerpo)
+
+    def log_message(self, fmt, *args):
+        pass
+
+# ================= MAIN =================
+def _opcion(nombre, defecto):
+    if nombre in sys.argv and sys.argv.index(nombre) + 1 < len(sys.argv):
+        return sys.argv[sys.argv.index(nombre) + 1]
+    return defecto
+
+def main():
+    host, puerto = _opcion("--host", HOST), int(_opcion("--puerto", PUERTO))
+    _vigente()
+    srv = ThreadingHTTPServer((host, puerto), Handler)
+    print(f"🌐 API de solo lectura en http://{host}:{puerto} (/flota, /historial, /plantas, /version)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 API detenida.")
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,28 @@
 # -*- coding: utf-8 -*-
 from pathlib import Path
 from datetime import datetime
+import time
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import streamlit as st
 import plotly.express as px
-from reportlab.lib.pagesizes import landscape, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER
+from datos import (normalize, leer_hojas, unir_diagnosticos,
+                   a_arrow, leer_arrow, filtrar_arrow, listar_arrow, snapshot_vigente, APP_DATA, SNAP_DIR,
+                   plantas_particionadas, leer_particion, particiones_vigentes, leer_agregados, version_archivos,
+                   agregados_planta, combinar_agregados, firma_filas)
+from umbrales import (NIVELES, GASES, LIMITES_IEEE, LIMITES_IEC, cargar, tabla_gases, clasificar,
+                      a_cortes, desde_cortes, a_json)
 
 # ==========================
 # CONFIGURACIÓN BASE
 # ==========================
 BASE = Path(__file__).parent
-OUT_FILE = BASE / "data/trafos_maestro_tabla.xlsx"
+# Se resuelve en cada rerun: si publicar.py dejó una versión nueva, se usa desde aquí
+DATA_DIR, DATA_VERSION = snapshot_vigente(SNAP_DIR, APP_DATA)
+OUT_FILE = DATA_DIR / "trafos_maestro_tabla.xlsx"
+PART_DIR = particiones_vigentes(DATA_DIR / "particiones")  # subcarpeta vNNNNNN vigente
+VERSION_DATOS = f"v{DATA_VERSION}" if DATA_VERSION is not None else version_archivos(DATA_DIR)
 LOGO_FILE = BASE / "cemex_logo.png"
 
 st.set_page_config(page_title="Dashboard Transformadores CEMEX", layout="wide", page_icon="⚡")
@@ -48,18 +56,6 @@ check_login()
 # ==========================
 # FUNCIONES AUXILIARES
 # ==========================
-def normalize(txt: str):
-    if not isinstance(txt, str):
-        return ""
-    import unicodedata
-    return (
-        unicodedata.normalize("NFKD", txt)
-        .encode("ascii", "ignore")
-        .decode("utf-8")
-        .lower()
-        .strip()
-    )
-
 def color_alerta(txt: str):
     t = normalize(txt)
     if any(x in t for x in ["critico", "t3", "d2"]):
@@ -73,83 +69,129 @@ def color_alerta(txt: str):
 # ==========================
 # CARGA DE DATOS
 # ==========================
-@st.cache_data(show_spinner=False)
+@st.cache_resource(show_spinner=False, max_entries=2)
 def load_data(path):
-    """Carga las hojas del Excel y crea las que falten automáticamente, evitando duplicados."""
+    """Flota unida como tabla Arrow inmutable, cargada una vez por proceso y compartida
+    por todas las sesiones. Si el pipeline dejó `trafos.arrow`, se abre con memory-map.
+
+    La ruta incluye la carpeta del snapshot, así que una versión nueva es otra entrada
+    de caché; las viejas salen solas por `max_entries`.
+    """
+    arrow = Path(path).with_name("trafos.arrow")
+    if arrow.exists():
+        return leer_arrow(arrow)
     try:
-        xls = pd.ExcelFile(path)
-        sheets = xls.sheet_names
+        hojas = leer_hojas(path, avisar=st.warning)
     except Exception as e:
         st.error(f"❌ Error al abrir el archivo: {e}")
-        return pd.DataFrame()
-
-    def get_sheet(name, cols=None):
-        if name in sheets:
-            df = pd.read_excel(path, sheet_name=name)
-            if cols:
-                for c in cols:
-                    if c not in df.columns:
-                        df[c] = ""
-            return df
+        return a_arrow(pd.DataFrame(columns=["Planta", "Transformador", "Ubicacion", "Diagnóstico IEEE"]))
+    return a_arrow(unir_diagnosticos(hojas))
+
+@st.cache_resource(show_spinner=False, max_entries=128)
+def load_particion(carpeta, planta):
+    """Partición Arrow de una planta (memory-map), cargada la primera vez que alguien la mira.
+
+    `carpeta` es la subcarpeta versionada: al reescribirse las particiones cambia la
+    clave de caché y el próximo rerun ya lee la versión nueva.
+    """
+    return leer_particion(carpeta, planta)
+
+def tabla_plantas(plantas=None):
+    """Solo las particiones pedidas (None = todas), concatenadas sin copiar buffers."""
+    disponibles = listar_plantas()
+    pedidas = [p for p in (disponibles if plantas is None else plantas) if p in disponibles]
+    if not pedidas:
+        return load_particion(PART_DIR, disponibles[0]).slice(0, 0) if disponibles else a_arrow(
+            pd.DataFrame(columns=["Planta", "Transformador", "Ubicacion", "Diagnóstico IEEE"]))
+    return pa.concat_tables([load_particion(PART_DIR, p) for p in pedidas])
+
+@st.cache_resource(show_spinner=False)
+def limites_vigentes():
+    """Límites IEEE/IEC con los que corre el pipeline (de fábrica + umbrales.json), leídos una vez."""
+    return cargar("IEEE", LIMITES_IEEE), cargar("IEC", LIMITES_IEC)
+
+LIMITS_IEEE, LIMITS_IEC = limites_vigentes()
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_gases(carpeta, historico=False):
+    """Concentraciones como arreglos float y códigos de planta, listos para reclasificar
+    en memoria. Se arma una vez por snapshot y alcance, con el diagnóstico vigente ya calculado."""
+    nombre, hoja = ("gases_historico.arrow", "Datos") if historico else ("gases_ultimas.arrow", "UltimaPorTrafo")
+    arrow = Path(carpeta) / nombre
+    try:
+        if arrow.exists():
+            df = leer_arrow(arrow).to_pandas()
         else:
-            st.warning(f"⚠️ Hoja '{name}' no encontrada. Se generará vacía.")
-            base_cols = ["Planta", "Transformador", "Ubicacion"]
-            if cols:
-                base_cols += cols
-            return pd.DataFrame(columns=base_cols)
-
-    estados = get_sheet("Estados", ["Diagnóstico IEEE"])
-    diag3 = get_sheet("Diag_3Ratios", ["R1 (C2H2/C2H4)", "R2 (CH4/H2)", "R3 (C2H4/C2H6)", "Diagnóstico 3 Ratios"])
-    iec = get_sheet("Diag_IEC", ["Diagnóstico IEC"])
-    duval = get_sheet("Diag_Duval", ["Diagnóstico Duval"])
-
-    key = ["Planta", "Transformador", "Ubicacion"]
-
-    # Limpieza de duplicados
-    def clean_cols(df, keep_cols):
-        df = df.loc[:, ~df.columns.duplicated()]
-        extras = [c for c in df.columns if c not in keep_cols]
-        return df
-
-    estados = clean_cols(estados, key + ["Fecha de Muestra", "Diagnóstico IEEE"])
-    diag3 = clean_cols(diag3, key + ["R1 (C2H2/C2H4)", "R2 (CH4/H2)", "R3 (C2H4/C2H6)", "Diagnóstico 3 Ratios"])
-    iec = clean_cols(iec, key + ["Diagnóstico IEC"])
-    duval = clean_cols(duval, key + ["Diagnóstico Duval"])
-
-    # Eliminar Fecha duplicada
-    for df in [diag3, iec, duval]:
-        if "Fecha de Muestra" in df.columns:
-            df = df.drop(columns=["Fecha de Muestra"])
-
-    df = estados.merge(diag3, on=key, how="outer", suffixes=("", "_3R"))
-    df = df.merge(iec, on=key, how="outer", suffixes=("", "_IEC"))
-    df = df.merge(duval, on=key, how="outer", suffixes=("", "_DUV"))
-
-    if "Diagnóstico IEEE" not in df.columns:
-        df["Diagnóstico IEEE"] = "Indeterminado"
-
-    df.loc[
-        df["Diagnóstico IEEE"].str.contains("Normal", case=False, na=False),
-        ["Diagnóstico 3 Ratios", "Diagnóstico IEC", "Diagnóstico Duval"],
-    ] = "Normal"
-
-    def final_y_fia(row):
-        ieee = normalize(row.get("Diagnóstico IEEE", ""))
-        if "normal" in ieee:
-            return "Normal (100%)", 100
-        if "critico" in ieee:
-            return "Crítico (100%)", 100
-        if "preoc" in ieee:
-            return "Preocupante (85%)", 85
-        return "Indeterminado", 70
-
-    df[["Diagnóstico Final", "Fiabilidad"]] = df.apply(final_y_fia, axis=1, result_type="expand")
-    return df
+            df = tabla_gases(pd.read_excel(Path(carpeta) / "trafos_maestro_tabla.xlsx", sheet_name=hoja))
+    except Exception as e:
+        st.error(f"❌ No se pudieron leer las concentraciones ({hoja}): {e}")
+        df = pd.DataFrame(columns=["Planta", "Transformador", "Ubicacion", "Fecha de Muestra"])
+    plantas, codigos = np.unique(df["Planta"].astype(str).to_numpy(), return_inverse=True)
+    gases = {g: df[g].to_numpy("float64") for g in GASES if g in df.columns}
+    return {
+        "llave": df[["Planta", "Transformador", "Ubicacion", "Fecha de Muestra"]],
+        "gases": gases, "plantas": plantas, "codigos": codigos, "n": len(df),
+        "IEEE": clasificar(gases, LIMITS_IEEE, len(df)), "IEC": clasificar(gases, LIMITS_IEC, len(df)),
+    }
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def agregados_de_planta(planta, firma, _filas):
+    """Agregados de una planta, con `firma` (su contenido, o la versión de particiones
+    que la contiene) como clave: mientras no cambie no se vuelve a sus filas."""
+    return agregados_planta(_filas())
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_resumen(carpeta, version):
+    """Agregados materializados de la flota (conteos, acuerdo entre métodos, peores
+    trafos), armados una vez por versión de datos a partir de los de cada planta.
+
+    Con particiones se leen los agregados que dejó el pipeline junto a cada una: el
+    panorama no abre ninguna partición. Si no, la tabla completa ya está en memoria.
+    """
+    particiones = particiones_vigentes(Path(carpeta) / "particiones")
+    if particiones.is_dir():
+        por_planta = leer_agregados(particiones)
+        # Versiones escritas antes de que el pipeline guardara agregados: se arman de las filas
+        for p in set(plantas_particionadas(particiones)) - set(por_planta):
+            por_planta[p] = agregados_de_planta(p, str(particiones),
+                                                lambda p=p: load_particion(particiones, p).to_pandas())
+    else:
+        por_planta = {p: agregados_de_planta(p, firma_filas(g), lambda g=g: g)
+                      for p, g in filtrar().groupby("Planta")}
+    return combinar_agregados(por_planta) if por_planta else None
+
+# Orden de lectura (el primero que exista en la carpeta de datos):
+#   1. particiones/  tablas Arrow por planta, con memory-map y compartidas entre sesiones;
+#                    solo se cargan las plantas que se están mirando
+#   2. trafos.arrow  la flota entera como una tabla Arrow compartida (`load_data`)
+#   3. el Excel, convertido una vez a tabla Arrow compartida (`load_data`)
+# Los snapshots traen las tres; `trafos.arrow` lo usa además api.py y `trafos.sqlite`
+# solo guarda el histórico de muestras para /historial. En todos los casos solo se
+# materializan las filas visibles.
+USE_PART = PART_DIR.is_dir()
+
+def listar_plantas():
+    if USE_PART:
+        return plantas_particionadas(PART_DIR)
+    return listar_arrow(load_data(OUT_FILE), "Planta")
+
+def listar_transformadores(planta):
+    if USE_PART:
+        return listar_arrow(tabla_plantas([planta]), "Transformador")
+    return listar_arrow(load_data(OUT_FILE), "Transformador", planta=planta)
+
+def filtrar(plantas=None, estados=None, q="", transformador=None, limit=None):
+    if USE_PART:
+        return filtrar_arrow(tabla_plantas(plantas), None, estados, q, transformador, limit)
+    return filtrar_arrow(load_data(OUT_FILE), plantas, estados, q, transformador, limit)
 
 # ==========================
 # PDF BUILDER
 # ==========================
+# reportlab se importa solo al generar el PDF: no pesa en cada rerun ni en el arranque
 def add_footer(canvas_doc, doc):
+    from reportlab.lib import colors
+
     canvas_doc.saveState()
     footer_text = "© CEMEX — Reporte generado automáticamente por Dashboard DGA"
     canvas_doc.setFont("Helvetica", 7)
@@ -162,6 +204,12 @@ def add_footer(canvas_doc, doc):
     canvas_doc.restoreState()
 
 def build_pdf(df: pd.DataFrame, outfile: Path):
+    from reportlab.lib.pagesizes import landscape, A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
+
     buffer = str(outfile)
     doc = SimpleDocTemplate(
         buffer,
@@ -234,26 +282,157 @@ col2.markdown("<p style='margin-top:0;color:gray'>Monitoreo DGA · 3 Ratios · I
 
 with st.sidebar:
     st.header("Panel de control")
+    if DATA_VERSION is not None:
+        st.caption(f"Datos: snapshot v{DATA_VERSION}")
     if st.button("🔄 Refresh / Actualizar"):
         st.cache_data.clear()
+        st.cache_resource.clear()
         st.rerun()
-    df = load_data(OUT_FILE)
     q = st.text_input("Buscar (Planta / Transformador / Ubicación):", "")
-    plantas = sorted(df["Planta"].dropna().unique().tolist())
-    sel_plants = st.multiselect("Planta(s):", plantas, default=plantas)
+    plantas = listar_plantas()
+    # Con particiones arranca con una planta (el resto se carga al seleccionarlo);
+    # con la tabla completa ya en memoria se muestra toda la flota
+    sel_plants = st.multiselect("Planta(s):", plantas, default=plantas[:1] if USE_PART else plantas)
     estados = ["Normal", "Preocupante", "Crítico"]
     sel_ieee = st.multiselect("Diagnóstico IEEE:", estados, default=estados)
 
-tab1, tab2 = st.tabs(["📊 Resumen general", "🔍 Diagnóstico detallado"])
+tab1, tab2, tab3, tab4 = st.tabs(["📊 Resumen general", "🔍 Diagnóstico detallado", "🧪 Umbrales what-if",
+                                  "🧭 Panorama flota"])
+
+# Las secciones con widgets propios son fragmentos: al interactuar con ellas solo se
+# vuelve a ejecutar el fragmento, no la barra lateral, los gráficos ni la tabla.
+@st.fragment
+def seccion_pdf():
+    st.subheader("📄 Exportar PDF profesional (todas las plantas)")
+    if st.button("Generar PDF"):
+        outfile = Path.cwd() / f"reporte_transformadores_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
+        res = build_pdf(filtrar(estados=["Preocupante", "Crítico"]), outfile)
+        st.success("✅ PDF generado correctamente.")
+        st.download_button("Descargar PDF", data=open(res, "rb").read(), file_name=res.name, mime="application/pdf")
+
+@st.fragment
+def detalle_trafo(plantas):
+    st.subheader("Diagnóstico detallado (1 transformador)")
+    col1, col2 = st.columns(2)
+    with col1:
+        planta = st.selectbox("Planta", plantas)
+    with col2:
+        trs = listar_transformadores(planta)
+        trafo = st.selectbox("Transformador", trs)
+
+    row = filtrar([planta], transformador=trafo, limit=1)
+    if not row.empty:
+        r = row.iloc[0]
+        st.markdown(f"### Diagnóstico IEEE: **{r['Diagnóstico IEEE']}** — Diagnóstico Final: **{r['Diagnóstico Final']}**")
+        st.markdown("#### Método de 3 Ratios")
+        ratios = pd.DataFrame({
+            "Cociente": ["R1 Acetileno / Etileno", "R2 Metano / Hidrógeno", "R3 Etileno / Etano", "Resultado final"],
+            "Valor": [r.get("R1 (C2H2/C2H4)"), r.get("R2 (CH4/H2)"), r.get("R3 (C2H4/C2H6)"), r.get("Diagnóstico 3 Ratios")],
+        })
+        st.dataframe(ratios, use_container_width=True)
+
+def editor_limites(limites, key):
+    """Tabla editable gas × (Normal ≤, Preocupante ≤); lo que quede vacío vuelve al valor vigente."""
+    base = pd.DataFrame(a_cortes(limites), index=["Normal ≤", "Preocupante ≤"]).T
+    ed = st.data_editor(base, key=key, use_container_width=True).astype(float).fillna(base)
+    if (ed["Normal ≤"] > ed["Preocupante ≤"]).any():
+        st.warning("⚠️ Hay gases con 'Normal ≤' mayor que 'Preocupante ≤'.")
+    return desde_cortes({g: (r["Normal ≤"], r["Preocupante ≤"]) for g, r in ed.iterrows()})
+
+def conteo_por_planta(g, sev):
+    m = np.bincount(g["codigos"] * len(NIVELES) + sev, minlength=len(g["plantas"]) * len(NIVELES))
+    return pd.DataFrame(m.reshape(-1, len(NIVELES)), index=g["plantas"], columns=NIVELES)
+
+@st.fragment
+def umbrales_whatif():
+    st.subheader("Umbrales what-if (IEEE C57.104 / IEC 60599)")
+    alcance = st.radio("Reclasificar", ["Flota (última muestra)", "Histórico completo"], horizontal=True)
+    g = load_gases(DATA_DIR, historico=alcance.startswith("Hist"))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**IEEE** (CH4, C2H4, C2H2, TDGC)")
+        lim_ieee = editor_limites(LIMITS_IEEE, "wi_ieee")
+    with col2:
+        st.markdown("**IEC** (H2, CH4, C2H6, C2H4, C2H2)")
+        lim_iec = editor_limites(LIMITS_IEC, "wi_iec")
+
+    t0 = time.perf_counter()
+    nuevo = {"IEEE": clasificar(g["gases"], lim_ieee, g["n"]), "IEC": clasificar(g["gases"], lim_iec, g["n"])}
+    ms = (time.perf_counter() - t0) * 1000
+    st.caption(f"{g['n']} muestras reclasificadas en {ms:.1f} ms")
+
+    for norma, col in zip(("IEEE", "IEC"), st.columns(2)):
+        antes = np.bincount(g[norma], minlength=len(NIVELES))
+        ahora = np.bincount(nuevo[norma], minlength=len(NIVELES))
+        for nivel, c, a, b in zip(NIVELES, col.columns(len(NIVELES)), antes, ahora):
+            c.metric(f"{norma} · {nivel}", int(b), delta=int(b - a), delta_color="off" if nivel == "Normal" else "inverse")
+        tabla = conteo_por_planta(g, nuevo[norma]).rename_axis("Planta").reset_index()
+        fig = px.bar(
+            tabla.melt(id_vars="Planta", var_name="Estado", value_name="Muestras"),
+            x="Planta", y="Muestras", color="Estado", title=f"{norma} por planta (what-if)",
+            color_discrete_map={"Crítico": PALETTE["red"], "Preocupante": PALETTE["yellow"], "Normal": PALETTE["green"]},
+        )
+        col.plotly_chart(fig, use_container_width=True)
+
+    cambio = (nuevo["IEEE"] != g["IEEE"]) | (nuevo["IEC"] != g["IEC"])
+    st.markdown(f"**Cambian de estado:** {int(cambio.sum())}")
+    if cambio.any():
+        idx = np.flatnonzero(cambio)[:500]
+        nombres = np.array(NIVELES, dtype=object)
+        st.dataframe(g["llave"].iloc[idx].assign(**{
+            "IEEE vigente": nombres[g["IEEE"][idx]], "IEEE what-if": nombres[nuevo["IEEE"][idx]],
+            "IEC vigente": nombres[g["IEC"][idx]], "IEC what-if": nombres[nuevo["IEC"][idx]],
+        }), use_container_width=True)
+
+    st.download_button("⬇️ Exportar umbrales (umbrales.json)", data=a_json({"IEEE": lim_ieee, "IEC": lim_iec}),
+                       file_name="umbrales.json", mime="application/json")
+    st.caption("Copiar a Codigos/umbrales.json: estados.py e iec.py lo leen al correr el pipeline.")
+
+@st.fragment
+def panorama():
+    st.subheader("Panorama de la flota")
+    r = load_resumen(str(DATA_DIR), VERSION_DATOS)
+    if r is None:
+        st.info("No hay datos para resumir.")
+        return
+    pp = r["por_planta"]
+    estados_pp = [c for c in ["Normal", "Preocupante", "Crítico", "Indeterminado"] if c in pp.columns]
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Trafos", int(pp["Trafos"].sum()))
+    c2.metric("Críticos", int(pp["Crítico"].sum()) if "Crítico" in pp else 0)
+    c3.metric("Preocupantes", int(pp["Preocupante"].sum()) if "Preocupante" in pp else 0)
+    c4.metric("Los 4 métodos coinciden", f"{r['unanimes_pct']}%")
+
+    col1, col2 = st.columns(2)
+    fig = px.bar(
+        pp[estados_pp].reset_index().melt(id_vars="Planta", var_name="Estado", value_name="Trafos"),
+        x="Planta", y="Trafos", color="Estado", title="Diagnóstico IEEE por planta",
+        color_discrete_map={"Crítico": PALETTE["red"], "Preocupante": PALETTE["yellow"], "Normal": PALETTE["green"]},
+    )
+    col1.plotly_chart(fig, use_container_width=True)
+    fig = px.imshow(r["acuerdo"], text_auto=True, zmin=0, zmax=100, color_continuous_scale="RdYlGn",
+                    title="Acuerdo entre métodos (% de trafos)")
+    col2.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(pp, use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        par = st.selectbox("Tabla cruzada entre métodos", list(r["cruces"]), format_func=lambda x: x.replace("|", " × "))
+        st.dataframe(r["cruces"][par], use_container_width=True)
+    with col2:
+        planta = st.selectbox("Trafos más comprometidos de", list(r["peores"]))
+        peores = r["peores"][planta]
+        diag = [c for c in peores.columns if c.startswith("Diagnóstico")]
+        st.dataframe(peores.style.map(color_alerta, subset=diag), use_container_width=True)
 
 # ==========================
 # TAB 1 — RESUMEN GENERAL
 # ==========================
 with tab1:
-    F = df.copy()
-    if q:
-        F = F[F.apply(lambda r: q.lower() in str(r).lower(), axis=1)]
-    F = F[F["Planta"].isin(sel_plants) & F["Diagnóstico IEEE"].isin(sel_ieee)]
+    F = filtrar(sel_plants, sel_ieee, q)
 
     c1, c2, c3, c4 = st.columns(4)
     total = len(F)
@@ -286,38 +465,28 @@ with tab1:
     styled = tabla.style.map(lambda v: color_alerta(v), subset=mostrar[3:])
     st.dataframe(styled, use_container_width=True)
 
-    st.subheader("📄 Exportar PDF profesional (todas las plantas)")
-    if st.button("Generar PDF"):
-        outfile = Path.cwd() / f"reporte_transformadores_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
-        res = build_pdf(df, outfile)
-        st.success("✅ PDF generado correctamente.")
-        st.download_button("Descargar PDF", data=open(res, "rb").read(), file_name=res.name, mime="application/pdf")
+    seccion_pdf()
 
 # ==========================
 # TAB 2 — DETALLE
 # ==========================
 with tab2:
-    st.subheader("Diagnóstico detallado (1 transformador)")
-    col1, col2 = st.columns(2)
-    with col1:
-        planta = st.selectbox("Planta", sorted(df["Planta"].dropna().unique()))
-    with col2:
-        trs = sorted(df[df["Planta"] == planta]["Transformador"].dropna().unique())
-        trafo = st.selectbox("Transformador", trs)
+    detalle_trafo(plantas)
 
-    row = df[(df["Planta"] == planta) & (df["Transformador"] == trafo)].head(1)
-    if not row.empty:
-        r = row.iloc[0]
-        st.markdown(f"### Diagnóstico IEEE: **{r['Diagnóstico IEEE']}** — Diagnóstico Final: **{r['Diagnóstico Final']}**")
-        st.markdown("#### Método de 3 Ratios")
-        ratios = pd.DataFrame({
-            "Cociente": ["R1 Acetileno / Etileno", "R2 Metano / Hidrógeno", "R3 Etileno / Etano", "Resultado final"],
-            "Valor": [r.get("R1 (C2H2/C2H4)"), r.get("R2 (CH4/H2)"), r.get("R3 (C2H4/C2H6)"), r.get("Diagnóstico 3 Ratios")],
-        })
-        st.dataframe(ratios, use_container_width=True)
+# ==========================
+# TAB 3 — UMBRALES WHAT-IF
+# ==========================
+with tab3:
+    umbrales_whatif()
+
+# ==========================
+# TAB 4 — PANORAMA
+# ==========================
+with tab4:
+    panorama()
 
 # ==========================
 # EJECUCIÓN EN TERMINAL
 # ==========================
 # Para correr:
-# streamlit run /Users/joseluisgiadanscastellanos/Library/CloudStorage/OneDrive-CEMEX/Codigos/app.py
\ No newline at end of file
+# streamlit run /Users/joseluisgiadanscastellanos/Library/CloudStorage/OneDrive-CEMEX/Codigos/app.py
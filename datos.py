@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+from functools import reduce
+from pathlib import Path
+import hashlib, json, os
+from urllib.parse import quote, unquote
+import shutil
+import sqlite3
+import unicodedata
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from umbrales import tabla_gases
+
+# ================= RUTAS =================
+BASE = Path("/Users/joseluisgiadanscastellanos/Library/CloudStorage/OneDrive-CEMEX/OneDrive_Cemex")
+OUT_FILE = BASE / "Codigos/out/trafos_maestro_tabla.xlsx"
+DB_FILE = BASE / "Codigos/out/trafos.sqlite"
+ARROW_FILE = BASE / "Codigos/out/trafos.arrow"
+PART_DIR = BASE / "Codigos/out/particiones"
+GASES_ULT_FILE = BASE / "Codigos/out/gases_ultimas.arrow"      # para el panel what-if de umbrales
+GASES_HIST_FILE = BASE / "Codigos/out/gases_historico.arrow"
+APP_DATA = Path(__file__).parent / "data"   # carpeta de datos de app.py y api.py (junto a los scripts)
+SNAP_DIR = APP_DATA / "snapshots"           # publicar.py escribe aquí; app.py y api.py leen de aquí
+
+# ================= ESQUEMA =================
+KEY = ["Planta", "Transformador", "Ubicacion"]
+HOJAS = {
+    "Estados": ["Diagnóstico IEEE"],
+    "Diag_3Ratios": ["R1 (C2H2/C2H4)", "R2 (CH4/H2)", "R3 (C2H4/C2H6)", "Diagnóstico 3 Ratios"],
+    "Diag_IEC": ["Diagnóstico IEC"],
+    "Diag_Duval": ["Diagnóstico Duval"],
+}
+DIAG_COLS = ["Diagnóstico IEEE", "Diagnóstico 3 Ratios", "Diagnóstico IEC", "Diagnóstico Duval", "Diagnóstico Final"]
+
+# ================= FUNCIONES =================
+def normalize(txt: str):
+    if not isinstance(txt, str):
+        return ""
+    return (
+        unicodedata.normalize("NFKD", txt)
+        .encode("ascii", "ignore")
+        .decode("utf-8")
+        .lower()
+        .strip()
+    )
+
+def leer_hojas(path, avisar=print) -> dict:
+    """Lee las hojas de diagnóstico del Excel; las que falten se generan vacías."""
+    sheets = pd.ExcelFile(path).sheet_names
+    hojas = {}
+    for name, cols in HOJAS.items():
+        if name in sheets:
+            df = pd.read_excel(path, sheet_name=name)
+            for c in cols:
+                if c not in df.columns:
+                    df[c] = ""
+        else:
+            avisar(f"⚠️ Hoja '{name}' no encontrada. Se generará vacía.")
+            df = pd.DataFrame(columns=KEY + cols)
+        hojas[name] = df.loc[:, ~df.columns.duplicated()]
+    return hojas
+
+def unir_diagnosticos(hojas: dict) -> pd.DataFrame:
+    """Une las hojas de diagnóstico en una fila por trafo y calcula Final/Fiabilidad."""
+    df = hojas["Estados"].merge(hojas["Diag_3Ratios"], on=KEY, how="outer", suffixes=("", "_3R"))
+    df = df.merge(hojas["Diag_IEC"], on=KEY, how="outer", suffixes=("", "_IEC"))
+    df = df.merge(hojas["Diag_Duval"], on=KEY, how="outer", suffixes=("", "_DUV"))
+
+    if "Diagnóstico IEEE" not in df.columns:
+        df["Diagnóstico IEEE"] = "Indeterminado"
+
+    df.loc[
+        df["Diagnóstico IEEE"].str.contains("Normal", case=False, na=False),
+        ["Diagnóstico 3 Ratios", "Diagnóstico IEC", "Diagnóstico Duval"],
+    ] = "Normal"
+
+    def final_y_fia(row):
+        ieee = normalize(row.get("Diagnóstico IEEE", ""))
+        if "normal" in ieee:
+            return "Normal (100%)", 100
+        if "critico" in ieee:
+            return "Crítico (100%)", 100
+        if "preoc" in ieee:
+            return "Preocupante (85%)", 85
+        return "Indeterminado", 70
+
+    df[["Diagnóstico Final", "Fiabilidad"]] = df.apply(final_y_fia, axis=1, result_type="expand")
+    return df
+
+# ================= SQLITE =================
+def _q(col):
+    return '"' + col.replace('"', '""') + '"'
+
+def escribir_sqlite(datos: pd.DataFrame, path=None):
+    """Escribe el histórico de muestras (tabla `muestras`) en SQLite, indexado por trafo y fecha.
+
+    La flota unida no va aquí: la app y la API la leen de Arrow. Se escribe a un
+    archivo temporal y se renombra, para no leer nunca una base a medio escribir.
+    """
+    path = Path(path or DB_FILE)
+    tmp = path.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+    datos = datos.drop(columns=[c for c in datos.columns if str(c).startswith("_")])
+    datos = datos.assign(_fecha=pd.to_datetime(datos.get("Fecha de Muestra"), format="%d-%b-%y", errors="coerce"))
+    with sqlite3.connect(tmp) as con:
+        datos.astype({c: str for c in datos.columns if datos[c].dtype == object}).to_sql("muestras", con, index=False)
+        con.execute(f"CREATE INDEX ix_muestras_key ON muestras ({', '.join(map(_q, KEY))}, _fecha)")
+    con.close()
+    tmp.replace(path)
+
+def _conectar(path):
+    return sqlite3.connect(f"file:{Path(path).as_posix()}?mode=ro", uri=True)
+
+def consultar_muestras(path, planta, transformador, ubicacion=None) -> pd.DataFrame:
+    """Histórico de un trafo desde la tabla `muestras`, por fecha (usa ix_muestras_key)."""
+    sql = "SELECT * FROM muestras WHERE Planta = ? AND Transformador = ?"
+    params = [planta, transformador]
+    if ubicacion is not None:
+        sql += " AND Ubicacion = ?"
+        params.append(ubicacion)
+    with _conectar(path) as con:
+        df = pd.read_sql_query(sql + " ORDER BY _fecha", con, params=params)
+    con.close()
+    return df.drop(columns=["_fecha"])
+
+# ================= ARROW =================
+def a_arrow(df: pd.DataFrame) -> pa.Table:
+    """DataFrame -> tabla Arrow; columnas con tipos mezclados se guardan como texto."""
+    cols = {}
+    for c in df.columns:
+        try:
+            cols[str(c)] = pa.array(df[c], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            cols[str(c)] = pa.array(df[c].map(lambda v: None if pd.isna(v) else str(v)))
+    return pa.table(cols)
+
+def escribir_arrow(flota: pd.DataFrame, path=None):
+    """Guarda la flota como archivo Arrow IPC sin comprimir (apto para memory-map)."""
+    path = Path(path or ARROW_FILE)
+    tmp = path.with_suffix(".tmp")
+    tabla = a_arrow(flota)
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, tabla.schema) as writer:
+        writer.write_table(tabla)
+    tmp.replace(path)
+
+def leer_arrow(path) -> pa.Table:
+    """Abre el archivo Arrow con memory-map: los buffers no se copian al heap del proceso."""
+    return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+def filtrar_arrow(tabla: pa.Table, plantas=None, estados=None, q="", transformador=None, limit=None) -> pd.DataFrame:
+    """Filtros del dashboard (plantas, estado IEEE, trafo, búsqueda) como máscara sobre la tabla compartida.
+
+    Solo las filas seleccionadas se materializan en pandas; la tabla no se copia.
+    """
+    conds = []
+    if plantas is not None:
+        conds.append(pc.is_in(tabla["Planta"], value_set=pa.array(list(plantas), tabla["Planta"].type)))
+    if estados is not None:
+        col = tabla["Diagnóstico IEEE"]
+        conds.append(pc.is_in(col, value_set=pa.array(list(estados), col.type)))
+    if transformador is not None:
+        conds.append(pc.equal(tabla["Transformador"], transformador))
+    if q:
+        hits = [pc.match_substring(pc.cast(tabla[c], pa.string()), q, ignore_case=True) for c in KEY]
+        conds.append(reduce(pc.or_, hits))
+
+    if conds:
+        idx = pc.indices_nonzero(pc.fill_null(reduce(pc.and_, conds), False))
+    else:
+        idx = pa.array(range(tabla.num_rows), pa.uint64())
+    if limit:
+        idx = idx[:limit]
+    return tabla.take(idx).to_pandas()
+
+def listar_arrow(tabla: pa.Table, col, planta=None) -> list:
+    """Valores distintos de `col` (opcionalmente dentro de una planta)."""
+    vals = tabla[col]
+    if planta is not None:
+        vals = vals.filter(pc.fill_null(pc.equal(tabla["Planta"], planta), False))
+    return sorted(v for v in pc.unique(vals).to_pylist() if v is not None)
+
+# ================= PARTICIONES POR PLANTA =================
+FIRMAS = "_firmas.json"
+PART_ACTUAL = "ACTUAL"   # mismo puntero que los snapshots (lo resuelve `snapshot_vigente`)
+PART_CONSERVAR = 2       # versiones que quedan en disco para sesiones que aún leen la anterior
+AGREGADOS = ".agregados.json"  # agregados de cada planta, junto a su partición
+
+def _archivo_agregados(carpeta, planta) -> Path:
+    return Path(carpeta) / f"{quote(str(planta), safe='')}{AGREGADOS}"
+
+def _archivo_particion(carpeta, planta) -> Path:
+    return Path(carpeta) / f"{quote(str(planta), safe='')}.arrow"
+
+def escribir_particiones(flota: pd.DataFrame, carpeta=None, previa=None) -> Path:
+    """Un archivo Arrow por Planta, todos con el esquema de la flota completa
+    (así se pueden concatenar sin conversiones), y al lado sus agregados.
+
+    Cada escritura es una subcarpeta vNNNNNN nueva; al terminar se mueve el puntero
+    ACTUAL, igual que los snapshots de publicar.py. Nunca hay un momento sin
+    particiones vigentes y quien ya resolvió una versión la sigue leyendo entera.
+    Los agregados de una planta cuya firma no cambió respecto de `previa` (por
+    defecto, la versión vigente de `carpeta`) se copian en vez de recalcularse.
+    """
+    carpeta = Path(carpeta or PART_DIR)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    if previa is None and (carpeta / PART_ACTUAL).exists():
+        previa = particiones_vigentes(carpeta)
+    firmas_previas = firmas_particiones(previa) if previa is not None and Path(previa).is_dir() else {}
+    version = max([int(p.name[1:]) for p in carpeta.glob("v*") if p.name[1:].isdigit()], default=0) + 1
+    tmp = carpeta / f".v{version:06d}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+
+    tabla = a_arrow(flota)
+    firmas = {}
+    for planta in pc.unique(tabla["Planta"]).to_pylist():
+        if planta is None:
+            continue
+        parte = tabla.filter(pc.fill_null(pc.equal(tabla["Planta"], planta), False))
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, tabla.schema) as writer:
+            writer.write_table(parte)
+        buf = sink.getvalue()
+        firmas[planta] = hashlib.sha1(buf).hexdigest()
+        _archivo_particion(tmp, planta).write_bytes(buf)
+        if firmas_previas.get(planta) == firmas[planta] and _archivo_agregados(previa, planta).exists():
+            shutil.copyfile(_archivo_agregados(previa, planta), _archivo_agregados(tmp, planta))
+        else:
+            _archivo_agregados(tmp, planta).write_text(agregados_a_json(agregados_planta(parte.to_pandas())),
+                                                       encoding="utf-8")
+    # Firma de contenido por planta: una planta que no cambió conserva su firma entre versiones
+    (tmp / FIRMAS).write_text(json.dumps(firmas, ensure_ascii=False, indent=1), encoding="utf-8")
+
+    final = carpeta / f"v{version:06d}"
+    tmp.rename(final)
+    puntero = carpeta / f".{PART_ACTUAL}.tmp"
+    puntero.write_text(f"{version}\n")
+    os.replace(puntero, carpeta / PART_ACTUAL)
+
+    # Versiones viejas, temporales abortados y archivos del formato plano anterior
+    for p in carpeta.iterdir():
+        vieja = p.name[:1] == "v" and p.name[1:].isdigit() and int(p.name[1:]) <= version - PART_CONSERVAR
+        if vieja or (p.name.startswith(".v") and p.name.endswith(".tmp")):
+            shutil.rmtree(p, ignore_errors=True)
+        elif p.is_file() and (p.suffix == ".arrow" or p.name == FIRMAS or p.name.endswith(AGREGADOS)):
+            p.unlink()
+    return final
+
+def particiones_vigentes(carpeta) -> Path:
+    """Subcarpeta de la versión a la que apunta ACTUAL; `carpeta` misma si es del formato plano.
+
+    Las demás funciones de esta sección reciben la carpeta ya resuelta.
+    """
+    return snapshot_vigente(carpeta, carpeta)[0]
+
+def firmas_particiones(carpeta) -> dict:
+    """planta -> firma de contenido, del manifiesto o (si falta) hasheando cada archivo."""
+    try:
+        return json.loads((Path(carpeta) / FIRMAS).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {p: hashlib.sha1(_archivo_particion(carpeta, p).read_bytes()).hexdigest()
+                for p in plantas_particionadas(carpeta)}
+
+def plantas_particionadas(carpeta) -> list:
+    """Plantas disponibles según los archivos de partición (sin abrir ninguno)."""
+    return sorted(unquote(p.stem) for p in Path(carpeta).glob("*.arrow"))
+
+def leer_particion(carpeta, planta) -> pa.Table:
+    return leer_arrow(_archivo_particion(carpeta, planta))
+
+# ================= SNAPSHOTS =================
+def snapshot_vigente(snap_dir, defecto):
+    """(carpeta, versión) a la que apunta `snap_dir/ACTUAL`; (defecto, None) si no hay snapshots.
+
+    `publicar.py` solo mueve ACTUAL cuando la carpeta de la versión ya está completa.
+    """
+    try:
+        version = int((Path(snap_dir) / "ACTUAL").read_text().strip())
+    except (FileNotFoundError, ValueError):
+        return Path(defecto), None
+    carpeta = Path(snap_dir) / f"v{version:06d}"
+    return (carpeta, version) if carpeta.is_dir() else (Path(defecto), None)
+
+def version_archivos(carpeta) -> str:
+    """Versión de una carpeta sin snapshots: el mtime más reciente de sus archivos de datos."""
+    fuentes = [p for p in (Path(carpeta) / n for n in ("trafos.arrow", "trafos.sqlite", "particiones",
+                                                        "trafos_maestro_tabla.xlsx")) if p.exists()]
+    return f"m{max(p.stat().st_mtime_ns for p in fuentes)}" if fuentes else "vacio"
+
+# ================= AGREGADOS =================
+METODOS_DIAG = {"IEEE": "Diagnóstico IEEE", "IEC": "Diagnóstico IEC",
+                "3 Ratios": "Diagnóstico 3 Ratios", "Duval": "Diagnóstico Duval"}
+SEVERIDAD = {"Crítico": 2, "Preocupante": 1}
+PEORES = 10  # trafos por planta en la lista de peores
+
+def categoria(metodo: str, serie: pd.Series) -> pd.Series:
+    """Diagnóstico -> categoría comparable: estado para IEEE/IEC, familia de falla para 3 Ratios/Duval."""
+    t = serie.map(normalize)
+    if metodo in ("IEEE", "IEC"):
+        cat = pd.Series("Indeterminado", index=serie.index)
+        cat[t.str.contains("normal")] = "Normal"
+        cat[t.str.contains("preoc")] = "Preocupante"
+        cat[t.str.contains("critico")] = "Crítico"
+        return cat
+    cat = pd.Series("Indeterminado", index=serie.index)
+    cat[t.str.match(r"(t[123]|o|c) ")] = "Térmica"
+    cat[t.str.match(r"(pd|d[12]) ")] = "Eléctrica"
+    cat[t.str.startswith("dt ")] = "Mixta"
+    cat[t.str.contains("normal")] = "Normal"
+    return cat
+
+SIN_ALARMA = {"Normal", "Indeterminado"}
+
+def _alarma(cat: pd.Series) -> pd.Series:
+    return ~cat.isin(SIN_ALARMA)
+
+def agregados_planta(df: pd.DataFrame) -> dict:
+    """Agregados de UNA planta sobre la flota unida; todo es sumable entre plantas.
+
+    n / conteos (Diagnóstico IEEE) / unanimes (los 4 métodos coinciden en alarmar o no) /
+    cruces (tabla de contingencia por par de métodos) / peores (trafos más comprometidos).
+    """
+    cats = pd.DataFrame({m: categoria(m, df[c]) if c in df.columns else pd.Series("Indeterminado", index=df.index)
+                         for m, c in METODOS_DIAG.items()})
+    alarmas = cats.apply(_alarma)
+    metodos = list(METODOS_DIAG)
+    cruces = {f"{a}|{b}": pd.crosstab(cats[a], cats[b])
+              for i, a in enumerate(metodos) for b in metodos[i + 1:]}
+
+    puntaje = cats["IEEE"].map(SEVERIDAD).fillna(0) * 10 + alarmas.sum(axis=1)
+    cols = [c for c in KEY + ["Fecha de Muestra"] + list(METODOS_DIAG.values()) + ["Diagnóstico Final"] if c in df.columns]
+    peores = df[cols].assign(**{"Métodos en alarma": alarmas.sum(axis=1), "_p": puntaje})
+    peores = peores[peores["_p"] > 0].nlargest(PEORES, "_p").drop(columns="_p").reset_index(drop=True)
+    return {
+        "n": len(df),
+        "conteos": cats["IEEE"].value_counts().to_dict(),
+        "unanimes": int((alarmas.nunique(axis=1) == 1).sum()),
+        "cruces": cruces,
+        "peores": peores,
+    }
+
+def combinar_agregados(por_planta: dict) -> dict:
+    """Suma los agregados por planta en los de la flota (sin volver a las filas)."""
+    conteos = pd.DataFrame({p: a["conteos"] for p, a in por_planta.items()}).T.fillna(0).astype(int)
+    conteos = conteos.reindex(columns=[c for c in ["Normal", "Preocupante", "Crítico", "Indeterminado"]
+                                       if c in conteos.columns])
+    resumen = pd.DataFrame({
+        "Trafos": {p: a["n"] for p, a in por_planta.items()},
+        "Acuerdo 4 métodos (%)": {p: round(100 * a["unanimes"] / a["n"], 1) if a["n"] else 0.0
+                                  for p, a in por_planta.items()},
+    }).join(conteos)
+
+    cruces = {}
+    for a in por_planta.values():
+        for par, tab in a["cruces"].items():
+            cruces[par] = tab if par not in cruces else cruces[par].add(tab, fill_value=0)
+    cruces = {par: tab.fillna(0).astype(int) for par, tab in cruces.items()}
+
+    # % de trafos donde cada par coincide: misma categoría si comparten vocabulario
+    # (IEEE/IEC: estado; 3 Ratios/Duval: familia), si no, mismo estado de alarma
+    metodos = list(METODOS_DIAG)
+    acuerdo = pd.DataFrame(100.0, index=metodos, columns=metodos)
+    for par, tab in cruces.items():
+        a, b = par.split("|")
+        celdas = tab.stack()
+        if {a, b} in ({"IEEE", "IEC"}, {"3 Ratios", "Duval"}):
+            coincide = [x == y for x, y in celdas.index]
+        else:
+            coincide = [(x in SIN_ALARMA) == (y in SIN_ALARMA) for x, y in celdas.index]
+        total = celdas.sum()
+        acuerdo.loc[a, b] = acuerdo.loc[b, a] = round(100 * celdas[coincide].sum() / total, 1) if total else 0.0
+
+    total = sum(a["n"] for a in por_planta.values())
+    return {
+        "por_planta": resumen.rename_axis("Planta"),
+        "cruces": cruces,
+        "acuerdo": acuerdo,
+        "unanimes_pct": round(100 * sum(a["unanimes"] for a in por_planta.values()) / total, 1) if total else 0.0,
+        "peores": {p: a["peores"] for p, a in por_planta.items()},
+    }
+
+def firma_filas(df: pd.DataFrame) -> str:
+    """Firma de contenido de un DataFrame (para reutilizar agregados de plantas sin cambios)."""
+    return hashlib.sha1(pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy().tobytes()).hexdigest()
+
+def _tabla_json(df: pd.DataFrame) -> dict:
+    return {"index": df.index.tolist(), "columns": df.columns.tolist(), "data": df.to_numpy().tolist(),
+            "nombres": [df.index.name, df.columns.name]}
+
+def _tabla_desde_json(d: dict) -> pd.DataFrame:
+    df = pd.DataFrame(d["data"], index=d["index"], columns=d["columns"])
+    df.index.name, df.columns.name = d["nombres"]
+    return df
+
+def agregados_a_json(agg: dict) -> str:
+    """Agregados de una planta -> JSON (el archivo que escribe `escribir_particiones`)."""
+    return json.dumps({
+        "n": agg["n"], "conteos": agg["conteos"], "unanimes": agg["unanimes"],
+        "cruces": {par: _tabla_json(t) for par, t in agg["cruces"].items()},
+        "peores": _tabla_json(agg["peores"]),
+    }, ensure_ascii=False, default=lambda v: v.item())
+
+def agregados_desde_json(txt: str) -> dict:
+    d = json.loads(txt)
+    return {**d, "cruces": {par: _tabla_desde_json(t) for par, t in d["cruces"].items()},
+            "peores": _tabla_desde_json(d["peores"]).reset_index(drop=True)}
+
+def leer_agregados(carpeta) -> dict:
+    """planta -> agregados, desde los archivos junto a las particiones (sin abrir ninguna)."""
+    return {unquote(p.name[:-len(AGREGADOS)]): agregados_desde_json(p.read_text(encoding="utf-8"))
+            for p in sorted(Path(carpeta).glob(f"*{AGREGADOS}"))}
+
+# ================= MAIN =================
+def main():
+    if not OUT_FILE.exists():
+        print(f"❌ No encuentro el archivo: {OUT_FILE}")
+        return
+
+    flota = unir_diagnosticos(leer_hojas(OUT_FILE))
+    sheets = pd.ExcelFile(OUT_FILE).sheet_names
+    datos = pd.read_excel(OUT_FILE, sheet_name="Datos") if "Datos" in sheets else None
+    if datos is not None:
+        escribir_sqlite(datos)
+    escribir_arrow(flota)
+    escribir_particiones(flota)
+    if "UltimaPorTrafo" in sheets:
+        escribir_arrow(tabla_gases(pd.read_excel(OUT_FILE, sheet_name="UltimaPorTrafo")), GASES_ULT_FILE)
+    if datos is not None:
+        escribir_arrow(tabla_gases(datos), GASES_HIST_FILE)
+    print(f"✅ Base SQLite y tabla Arrow generadas: {DB_FILE}, {ARROW_FILE} ({len(flota)} trafos)")
+    print(f"   Particiones por planta: {PART_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,205 @@
 #!/usr/bin/env python3
 from pathlib import Path
+import numpy as np
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.worksheet.table import Table, TableStyleInfo
-from openpyxl.styles import PatternFill
+from salida_excel import AZUL, COLORES_FALLA, reemplazar_hoja
+import sys
 
 # ================= RUTAS =================
 BASE = Path("/Users/joseluisgiadanscastellanos/Library/CloudStorage/OneDrive-CEMEX/OneDrive_Cemex")
 OUT_FILE = BASE / "Codigos/out/trafos_maestro_tabla.xlsx"
 
+# ================= ZONAS DUVAL =================
+# Cada método se describe con sus gases y sus zonas como polígonos. Los triángulos
+# usan como coordenadas el % del 2º y 3er gas (el 1º queda determinado); el pentágono
+# usa el centroide (x, y) de los 5 gases. Las zonas se precompilan en una tabla
+# de búsqueda de celdas de RES %, así cada muestra se clasifica con un índice.
+RES = 0.1
+
+METODOS = {
+    # Triángulo 1 — coordenadas (%C2H4, %C2H2)
+    "Triángulo 1": {
+        "gases": ("CH4", "C2H4", "C2H2"),
+        "tipo": "triangulo",
+        "zonas": [
+            ("PD (Descargas Parciales)", [(0, 0), (2, 0), (0, 2)]),
+            ("T1 (<300°C)", [(2, 0), (20, 0), (20, 4), (0, 4), (0, 2)]),
+            ("T2 (300–700°C)", [(20, 0), (50, 0), (50, 4), (20, 4)]),
+            ("T3 (>700°C)", [(50, 0), (100, 0), (85, 15), (50, 15)]),
+            ("D1 (Descarga Baja Energía)", [(0, 13), (23, 13), (23, 77), (0, 100)]),
+            ("D2 (Arco)", [(23, 13), (40, 13), (40, 29), (71, 29), (23, 77)]),
+            ("DT (Discharge + Thermal)", [(0, 4), (50, 4), (50, 15), (85, 15), (71, 29), (40, 29), (40, 13), (0, 13)]),
+        ],
+        "resto": "Indeterminado",
+    },
+    # Triángulo 4 (fallas de baja temperatura) — coordenadas (%CH4, %C2H6)
+    "Triángulo 4": {
+        "gases": ("H2", "CH4", "C2H6"),
+        "tipo": "triangulo",
+        "zonas": [
+            ("PD (Descargas Parciales)", [(2, 0), (15, 0), (15, 1), (2, 1)]),
+            ("C (Carbonización del papel)", [(36, 0), (100, 0), (76, 24), (36, 24)]),
+            ("C (Carbonización del papel)", [(61, 24), (76, 24), (70, 30), (55, 30)]),
+            ("O (Sobrecalentamiento <250°C)", [(45, 46), (54, 46), (0, 100), (0, 91)]),
+            ("ND (No determinado)", [(55, 30), (70, 30), (54, 46), (45, 46), (0, 91), (0, 85)]),
+        ],
+        "resto": "S (Gasificación parásita)",
+    },
+    # Triángulo 5 (fallas térmicas en aceite) — coordenadas (%C2H4, %C2H6). T3 sube a
+    # 14 % C2H6 por encima de 70 % C2H4, como en la tabla de límites publicada; el borde
+    # C/ND se toma recto en 30 % C2H6 (aproximación del escalonado de la figura).
+    "Triángulo 5": {
+        "gases": ("CH4", "C2H4", "C2H6"),
+        "tipo": "triangulo",
+        "zonas": [
+            ("PD (Descargas Parciales)", [(0, 2), (1, 2), (1, 14), (0, 14)]),
+            ("O (Sobrecalentamiento <250°C)", [(0, 54), (10, 54), (10, 90), (0, 100)]),
+            ("T2 (300–700°C)", [(10, 0), (35, 0), (35, 12), (10, 12)]),
+            ("T3 (>700°C)", [(35, 0), (100, 0), (88, 12), (35, 12)]),
+            ("T3 (>700°C)", [(70, 12), (88, 12), (86, 14), (70, 14)]),
+            ("C (Carbonización del papel)", [(10, 12), (88, 12), (70, 30), (10, 30)]),
+            ("ND (No determinado)", [(10, 30), (70, 30), (10, 90)]),
+        ],
+        "resto": "S (Gasificación parásita)",
+    },
+    # Pentágono 1 — centroide (x, y); ejes H2 arriba y luego C2H6, CH4, C2H4, C2H2
+    "Pentágono 1": {
+        "gases": ("H2", "C2H6", "CH4", "C2H4", "C2H2"),
+        "tipo": "pentagono",
+        "zonas": [
+            ("PD (Descargas Parciales)", [(0, 33), (-1, 33), (-1, 24.5), (0, 24.5)]),
+            ("D1 (Descarga Baja Energía)", [(0, 40), (38, 12), (32, -6.1), (4, 16), (0, 1.5)]),
+            ("D2 (Arco)", [(4, 16), (32, -6.1), (24.3, -30), (0, -3), (0, 1.5)]),
+            ("T3 (>700°C)", [(0, -3), (24.3, -30), (23.5, -32.4), (1, -32.4), (-6, -4)]),
+            ("T2 (300–700°C)", [(-6, -4), (1, -32.4), (-22.5, -32.4)]),
+            ("T1 (<300°C)", [(-6, -4), (-22.5, -32.4), (-23.5, -32.4), (-35, 3.1), (0, 1.5), (0, -3)]),
+            ("S (Gasificación parásita)", [(0, 1.5), (-35, 3.1), (-38, 12.4), (0, 40)]),
+        ],
+        "resto": "Indeterminado",
+    },
+}
+
+# Columna de salida por método ("Diagnóstico Duval" sigue siendo el Triángulo 1)
+COLUMNAS = {
+    "Triángulo 1": "Diagnóstico Duval",
+    "Triángulo 4": "Diagnóstico Duval 4",
+    "Triángulo 5": "Diagnóstico Duval 5",
+    "Pentágono 1": "Diagnóstico Pentágono",
+}
+
+_TABLAS = {}
+
+def _dentro(px, py, poly):
+    """Ray casting vectorizado: máscara de los puntos (px, py) dentro de `poly`."""
+    dentro = np.zeros(px.shape, dtype=bool)
+    for (x1, y1), (x2, y2) in zip(poly, poly[1:] + poly[:1]):
+        if y1 == y2:
+            continue
+        cruza = (y1 > py) != (y2 > py)
+        xint = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        dentro ^= cruza & (px < xint)
+    return dentro
+
+def _extension(m):
+    return (0.0, 100.0) if m["tipo"] == "triangulo" else (-40.0, 40.0)
+
+def _tabla(nombre):
+    """Rasteriza (una vez por proceso) las zonas del método en una tabla de códigos."""
+    if nombre not in _TABLAS:
+        m = METODOS[nombre]
+        lo, hi = _extension(m)
+        n = int(round((hi - lo) / RES))
+        c = lo + (np.arange(n) + 0.5) * RES
+        px, py = np.meshgrid(c, c, indexing="ij")
+        if m["tipo"] == "triangulo":
+            # celdas que cruzan la hipotenusa: se evalúan en su proyección dentro del triángulo
+            s = px + py
+            escala = np.where(s > 100 - RES / 10, (100 - RES / 10) / s, 1.0)
+            px, py = px * escala, py * escala
+        tabla = np.zeros((n, n), dtype=np.int8)
+        for k, (_, poly) in enumerate(m["zonas"], start=1):
+            tabla[(tabla == 0) & _dentro(px, py, poly)] = k
+        etiquetas = np.array([m["resto"]] + [z for z, _ in m["zonas"]] + ["Sin datos"], dtype=object)
+        _TABLAS[nombre] = (tabla, etiquetas)
+    return _TABLAS[nombre]
+
+def _centroide(pct):
+    """Centroide del polígono formado por los 5 % sobre los ejes del pentágono.
+
+    Un piso mínimo por gas evita polígonos degenerados (p. ej. un solo gas presente),
+    que así tienden al mismo límite que una muestra con trazas de los demás.
+    """
+    pct = np.maximum(pct, 1e-3)
+    ang = np.deg2rad(90 + 72 * np.arange(5))
+    x, y = pct * np.cos(ang), pct * np.sin(ang)
+    x2, y2 = np.roll(x, -1, axis=1), np.roll(y, -1, axis=1)
+    cruz = x * y2 - x2 * y
+    area = cruz.sum(axis=1) / 2
+    cx = ((x + x2) * cruz).sum(axis=1) / (6 * area)
+    cy = ((y + y2) * cruz).sum(axis=1) / (6 * area)
+    return cx, cy
+
+def porcentajes(df: pd.DataFrame, gases, ausentes_cero=False) -> np.ndarray:
+    """% relativo de cada gas por fila; NaN (-> "Sin datos") si la suma es 0 o si algún
+    gas es vacío, no numérico o negativo. Una columna que no existe también da NaN,
+    salvo con `ausentes_cero` (Triángulo 1, como el calc_duval original: cuenta como 0)."""
+    relleno = 0.0 if ausentes_cero else np.nan
+    g = np.column_stack([
+        pd.to_numeric(df[c], errors="coerce").to_numpy(float) if c in df.columns else np.full(len(df), relleno)
+        for c in gases
+    ])
+    validos = (np.isfinite(g) & (g >= 0)).all(axis=1, keepdims=True)
+    total = np.where(validos, g, 0).sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total > 0, g / total * 100, np.nan)
+
+def clasificar(nombre, df: pd.DataFrame) -> np.ndarray:
+    """Diagnóstico de todas las filas de `df` según el método `nombre` (vectorizado, O(1) por fila)."""
+    m = METODOS[nombre]
+    tabla, etiquetas = _tabla(nombre)
+    pct = porcentajes(df, m["gases"], ausentes_cero=nombre == "Triángulo 1")
+    if m["tipo"] == "triangulo":
+        x, y = pct[:, 1], pct[:, 2]
+    else:
+        x, y = _centroide(pct)
+    validos = np.isfinite(x) & np.isfinite(y)
+    lo, _ = _extension(m)
+    n = tabla.shape[0]
+    i = np.clip(np.floor((np.where(validos, x, lo) - lo) / RES), 0, n - 1).astype(np.intp)
+    j = np.clip(np.floor((np.where(validos, y, lo) - lo) / RES), 0, n - 1).astype(np.intp)
+    codigos = np.where(validos, tabla[i, j], len(etiquetas) - 1)
+    return etiquetas[codigos]
+
+def clasificar_todos(df: pd.DataFrame) -> pd.DataFrame:
+    """Evalúa todos los métodos Duval sobre `df` (p. ej. el histórico completo) en una pasada."""
+    return pd.DataFrame({COLUMNAS[n]: clasificar(n, df) for n in METODOS}, index=df.index)
+
 # ================= FUNCIONES =================
 def calc_duval(row):
     """Calcula el diagnóstico según el Triángulo Duval 1 (CH4, C2H4, C2H2)."""
-    ch4 = row.get("CH4", 0)
-    c2h4 = row.get("C2H4", 0)
-    c2h2 = row.get("C2H2", 0)
-
-    total = ch4 + c2h4 + c2h2
-    if total == 0:
-        return 0, 0, 0, "Sin datos"
-
-    # Porcentajes
-    p_ch4 = (ch4 / total) * 100
-    p_c2h4 = (c2h4 / total) * 100
-    p_c2h2 = (c2h2 / total) * 100
-
-    # Clasificación según zonas del triángulo Duval 1
-    diag = "Indeterminado"
-
-    # PD – Descargas Parciales
-    if p_c2h2 < 4 and p_c2h4 < 10 and p_ch4 > 90:
-        diag = "PD (Descargas Parciales)"
-
-    # D1 – Descarga de baja energía
-    elif 23 <= p_c2h2 <= 50 and 13 <= p_c2h4 <= 23:
-        diag = "D1 (Descarga Baja Energía)"
-
-    # D2 – Descarga de alta energía / Arco
-    elif p_c2h2 > 50 and p_c2h4 < 20:
-        diag = "D2 (Arco)"
-
-    # T1 – Falla térmica < 300°C
-    elif p_c2h4 < 20 and p_c2h2 < 4 and p_ch4 > 80:
-        diag = "T1 (<300°C)"
-
-    # T2 – Falla térmica 300–700°C
-    elif 20 <= p_c2h4 <= 50 and p_c2h2 < 4 and 30 <= p_ch4 <= 80:
-        diag = "T2 (300–700°C)"
+    fila = pd.DataFrame([{g: row.get(g, 0) for g in METODOS["Triángulo 1"]["gases"]}])
+    pct = porcentajes(fila, METODOS["Triángulo 1"]["gases"], ausentes_cero=True)[0]
+    diag = clasificar("Triángulo 1", fila)[0]
+    if diag == "Sin datos":
+        return 0, 0, 0, diag
+    p_ch4, p_c2h4, p_c2h2 = pct
+    return round(p_ch4, 2), round(p_c2h4, 2), round(p_c2h2, 2), diag
 
-    # T3 – Falla térmica >700°C
-    elif p_c2h4 > 50 and p_c2h2 < 4 and p_ch4 < 20:
-        diag = "T3 (>700°C)"
+HOJA = "Diag_Duval"
+COLS_COLOR = list(COLUMNAS.values())
+COLORES = COLORES_FALLA + [("PD", AZUL)]
+NEEDED = ["CH4", "C2H4", "C2H2"]
 
-    # DT – Descarga + Térmica
-    elif 20 < p_c2h2 < 50 and 20 < p_c2h4 < 40:
-        diag = "DT (Discharge + Thermal)"
+def calcular(df: pd.DataFrame) -> pd.DataFrame:
+    """Hoja 'Diag_Duval' (todos los métodos, vectorizado) a partir de UltimaPorTrafo."""
+    duval_df = df[["Planta", "Transformador", "Ubicacion", "Fecha de Muestra"]].copy()
+    pct = np.nan_to_num(porcentajes(df, METODOS["Triángulo 1"]["gases"], ausentes_cero=True)).round(2)
+    duval_df["%CH4"], duval_df["%C2H4"], duval_df["%C2H2"] = pct.T
+    return duval_df.join(clasificar_todos(df))
 
-    return round(p_ch4, 2), round(p_c2h4, 2), round(p_c2h2, 2), diag
+def calcular_historico(df: pd.DataFrame) -> pd.DataFrame:
+    """Hoja 'Duval_Historico': todos los métodos sobre todas las muestras de 'Datos'."""
+    return df[["Planta", "Transformador", "Ubicacion", "Fecha de Muestra"]].join(clasificar_todos(df))
 
 # ================= MAIN =================
 def main():
@@ -68,68 +211,18 @@ def main():
     df = pd.read_excel(OUT_FILE, sheet_name="UltimaPorTrafo")
 
     # Asegurar columnas
-    needed = ["CH4", "C2H4", "C2H2"]
-    for col in needed:
+    for col in NEEDED:
         if col not in df.columns:
             print(f"❌ Falta columna {col}")
             return
 
-    # Calcular diagnóstico Duval
-    results = []
-    for _, row in df.iterrows():
-        p_ch4, p_c2h4, p_c2h2, diag = calc_duval(row)
-        results.append({
-            "Planta": row["Planta"],
-            "Transformador": row["Transformador"],
-            "Ubicacion": row["Ubicacion"],
-            "Fecha de Muestra": row["Fecha de Muestra"],
-            "%CH4": p_ch4,
-            "%C2H4": p_c2h4,
-            "%C2H2": p_c2h2,
-            "Diagnóstico Duval": diag
-        })
-
-    duval_df = pd.DataFrame(results)
-
-    # Guardar en hoja nueva
-    with pd.ExcelWriter(OUT_FILE, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
-        duval_df.to_excel(writer, index=False, sheet_name="Diag_Duval")
-
-    # ---- Formato tabla ----
-    wb = load_workbook(OUT_FILE)
-    ws = wb["Diag_Duval"]
-
-    nrows, ncols = duval_df.shape
-    table = Table(displayName="Tabla_Duval", ref=f"A1:H{nrows+1}")
-    style = TableStyleInfo(name="TableStyleMedium9", showRowStripes=True)
-    table.tableStyleInfo = style
-    ws.add_table(table)
-
-    # ---- Colorear diagnósticos ----
-    col_diag = None
-    for i, cell in enumerate(ws[1], start=1):
-        if cell.value == "Diagnóstico Duval":
-            col_diag = i
-            break
-
-    if col_diag:
-        for r in range(2, ws.max_row + 1):
-            val = str(ws.cell(r, col_diag).value or "")
-            if "T1" in val:
-                fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")  # Verde
-            elif "T2" in val:
-                fill = PatternFill(start_color="FFF2CC", end_color="FFF2CC", fill_type="solid")  # Amarillo
-            elif "T3" in val or "D2" in val or "DT" in val:
-                fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")  # Rojo
-            elif "PD" in val:
-                fill = PatternFill(start_color="9AD0F5", end_color="9AD0F5", fill_type="solid")  # Azul
-            else:
-                fill = None
-            if fill:
-                ws.cell(r, col_diag).fill = fill
-
-    wb.save(OUT_FILE)
+    # Guardar como tabla, con colores por rango en las columnas de diagnóstico
+    reemplazar_hoja(OUT_FILE, HOJA, calcular(df), COLS_COLOR, COLORES, tabla="Tabla_Duval")
+    if "--historico" in sys.argv:
+        hist = calcular_historico(pd.read_excel(OUT_FILE, sheet_name="Datos"))
+        reemplazar_hoja(OUT_FILE, "Duval_Historico", hist, COLS_COLOR, COLORES)
+        print(f"   Histórico evaluado: {len(hist)} muestras")
     print(f"✅ Hoja 'Diag_Duval' añadida con éxito a {OUT_FILE}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
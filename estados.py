@@ -1,21 +1,16 @@
 #!/usr/bin/env python3
 from pathlib import Path
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.worksheet.table import Table, TableStyleInfo
-from openpyxl.styles import PatternFill
+from salida_excel import COLORES_ESTADO, reemplazar_hoja
+import umbrales
 
 # ================= RUTAS =================
 BASE = Path("/Users/joseluisgiadanscastellanos/Library/CloudStorage/OneDrive-CEMEX/OneDrive_Cemex")
 OUT_FILE = BASE / "Codigos/out/trafos_maestro_tabla.xlsx"
 
 # ================= LIMITES IEEE C57.104 ================
-LIMITS = {
-    "CH4": [(100, "Normal"), (1000, "Preocupante"), (float("inf"), "Crítico")],
-    "C2H4": [(50, "Normal"), (500, "Preocupante"), (float("inf"), "Crítico")],
-    "C2H2": [(5, "Normal"), (35, "Preocupante"), (float("inf"), "Crítico")],
-    "TDGC": [(720, "Normal"), (1920, "Preocupante"), (float("inf"), "Crítico")],
-}
+# umbrales.json (exportado desde el panel what-if de la app) puede sobreescribirlos
+LIMITS = umbrales.cargar("IEEE", umbrales.LIMITES_IEEE)
 
 # ================= FUNCIONES =================
 def clasificar(valor, gas):
@@ -39,14 +34,12 @@ def estado_global(row):
         return "Preocupante"
     return "Normal"
 
-# ================= MAIN =================
-def main():
-    if not OUT_FILE.exists():
-        print(f"❌ No encuentro el archivo: {OUT_FILE}")
-        return
-
-    df = pd.read_excel(OUT_FILE, sheet_name="UltimaPorTrafo")
+HOJA = "Estados"
+COLS_COLOR = ["Diagnóstico IEEE"]
+COLORES = COLORES_ESTADO
 
+def calcular(df: pd.DataFrame) -> pd.DataFrame:
+    """Hoja 'Estados' a partir de UltimaPorTrafo."""
     # Buscar TDGC
     df = df.rename(columns=lambda x: x.strip())
     if "ppm" in df.columns:
@@ -55,39 +48,23 @@ def main():
         df = df.rename(columns={"TDCG": "TDGC"})
 
     # Clasificar
-    df["Diagnóstico IEEE"] = df.apply(estado_global, axis=1)
+    df["Diagnóstico IEEE"] = umbrales.diagnostico(df, LIMITS)  # vectorizado; mismo criterio que estado_global
 
     cols = ["Planta", "Transformador", "Ubicacion", "Fecha de Muestra", "Diagnóstico IEEE"]
-    estados_df = df[cols].copy()
-
-    # ==== Guardar (sin borrar formato del libro)
-    wb = load_workbook(OUT_FILE)
-    if "Estados" not in wb.sheetnames:
-        wb.create_sheet("Estados")
-    ws = wb["Estados"]
+    return df[cols].copy()
 
-    # Limpia el contenido, pero no borra la hoja
-    for row in ws["A2": f"Z{ws.max_row}"]:
-        for cell in row:
-            cell.value = None
-
-    # Copia los datos
-    for j, col in enumerate(estados_df.columns, start=1):
-        ws.cell(1, j).value = col
-    for i, row in enumerate(estados_df.itertuples(index=False), start=2):
-        for j, val in enumerate(row, start=1):
-            ws.cell(i, j).value = val
+# ================= MAIN =================
+def main():
+    if not OUT_FILE.exists():
+        print(f"❌ No encuentro el archivo: {OUT_FILE}")
+        return
 
-    # Aplica colores por diagnóstico
-    colores = {"Normal": "C6EFCE", "Preocupante": "FFF2CC", "Crítico": "FFC7CE"}
-    col_idx = estados_df.columns.get_loc("Diagnóstico IEEE") + 1
-    for i in range(2, ws.max_row + 1):
-        val = ws.cell(i, col_idx).value
-        if val in colores:
-            ws.cell(i, col_idx).fill = PatternFill(start_color=colores[val], end_color=colores[val], fill_type="solid")
+    df = pd.read_excel(OUT_FILE, sheet_name="UltimaPorTrafo")
+    estados_df = calcular(df)
 
-    wb.save(OUT_FILE)
+    # ==== Guardar solo esta hoja, coloreada con reglas por rango
+    reemplazar_hoja(OUT_FILE, HOJA, estados_df, COLS_COLOR, COLORES)
     print(f"✅ Hoja 'Estados' (Diagnóstico IEEE) actualizada en {OUT_FILE}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
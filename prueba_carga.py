@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+from pathlib import Path
+import json, os, random, shutil, subprocess, sys, tempfile, time
+import numpy as np
+import pandas as pd
+
+# ================= CONFIG =================
+BASE = Path(__file__).parent
+FLOTAS = [200, 2000]          # trafos en el fixture
+SESIONES = [1, 5, 10]         # sesiones concurrentes por proceso
+MUESTRAS = 6                  # muestras históricas por trafo
+TRAFOS_POR_PLANTA = 50
+SIN_FECHA = 0.02              # fracción de muestras sin Fecha de Muestra (la mitad tampoco tiene Informe)
+MODOS = {                     # qué archivos deja el fixture (app.py elige en este orden)
+    "part": ["particiones"],
+    "arrow": ["trafos.arrow"],
+    "xlsx": ["trafos_maestro_tabla.xlsx"],
+}
+
+# ================= FIXTURE =================
+def datos_sinteticos(n_trafos: int, muestras: int = MUESTRAS, seed: int = 0) -> pd.DataFrame:
+    """Hoja 'Datos' inventada con la forma de la real, pasada por `normalizar_lote`.
+
+    Entra como la entrega `iter_bloques` (Col1..Col3 con fechas de texto) e incluye
+    muestras sin fecha de muestra y sin ninguna fecha, como en los libros reales.
+    """
+    from ultimafecha import normalizar_lote
+    rng = np.random.default_rng(seed)
+    trafo = np.repeat(np.arange(n_trafos), muestras)
+    fecha = pd.Timestamp("2015-01-01") + pd.to_timedelta(
+        np.tile(np.arange(muestras) * 180, n_trafos) + rng.integers(0, 60, len(trafo)), unit="D")
+    muestra = pd.Series(fecha.strftime("%d/%m/%Y"), dtype=object)
+    informe = pd.Series((fecha + pd.Timedelta(days=15)).strftime("%d/%m/%Y"), dtype=object)
+    sin_muestra = rng.random(len(trafo)) < SIN_FECHA
+    muestra[sin_muestra] = None                                 # se usa Fecha de Informe
+    informe[sin_muestra & (rng.random(len(trafo)) < 0.5)] = None  # sin ninguna fecha
+    df = pd.DataFrame({
+        "Planta": [f"P{i:03d}" for i in trafo // TRAFOS_POR_PLANTA],
+        "Transformador": [f"TR-{i}" for i in trafo],
+        "Ubicacion": [f"Sub {i % 7}" for i in trafo],
+        "Col1": "Lab", "Col2": muestra, "Col3": informe,
+    })
+    for gas, media in [("H2", 60), ("CH4", 80), ("C2H6", 50), ("C2H4", 40), ("C2H2", 2), ("CO", 300), ("CO2", 2500)]:
+        df[gas] = rng.lognormal(np.log(media), 1.0, len(df)).round(1)
+    df["ppm"] = df[["H2", "CH4", "C2H6", "C2H4", "C2H2", "CO"]].sum(axis=1).round(1)
+    return normalizar_lote(df)
+
+def armar_fixture(n_trafos: int, carpeta: Path, modo: str = "part") -> Path:
+    """Copia los scripts de la app a `carpeta` y genera data/ con el pipeline real."""
+    import ultimafecha as uf
+    from datos import unir_diagnosticos, escribir_arrow, escribir_particiones
+    from umbrales import tabla_gases
+
+    data = carpeta / "data"
+    data.mkdir(parents=True, exist_ok=True)
+    for f in BASE.glob("*.py"):
+        shutil.copy(f, carpeta)
+    if (BASE / ".streamlit").is_dir():
+        shutil.copytree(BASE / ".streamlit", carpeta / ".streamlit", dirs_exist_ok=True)
+
+    datos = datos_sinteticos(n_trafos)
+    ult = uf.calcular_ultimas(datos)
+    hojas = uf.calcular_diagnosticos(ult)
+    flota = unir_diagnosticos(hojas)
+    archivos = MODOS[modo]
+    if "particiones" in archivos:
+        escribir_particiones(flota, data / "particiones")
+    if "trafos.arrow" in archivos:
+        escribir_arrow(flota, data / "trafos.arrow")
+    if "trafos_maestro_tabla.xlsx" in archivos:
+        uf.escribir_excel(datos, ult, data / "trafos_maestro_tabla.xlsx", hojas)
+    else:
+        escribir_arrow(tabla_gases(ult), data / "gases_ultimas.arrow")
+        escribir_arrow(tabla_gases(datos), data / "gases_historico.arrow")
+    return carpeta / "app.py"
+
+# ================= VERIFICACIONES =================
+def verificar_ultimas():
+    """UltimaPorTrafo con muestras sin fecha: batch, índice incremental y streaming coinciden.
+
+    `normalizar_lote` deja "NA" en '_FechaM_dt' cuando no hay ninguna fecha; esa
+    muestra cuenta como la más antigua y no debe romper el pipeline.
+    """
+    import ultimafecha as uf
+    crudo = pd.DataFrame({
+        "Planta": "P000", "Transformador": ["TR-0", "TR-0", "TR-1", "TR-1", "TR-2"], "Ubicacion": "Sub 0",
+        "Col1": "Lab", "Col2": ["01/02/2020", None, None, "05/06/2021", None],
+        "Col3": [None, None, "10/03/2019", None, None], "H2": [1.0, 2.0, 3.0, 4.0, 5.0],
+    })
+    df = uf.normalizar_lote(crudo)
+    ult = uf.calcular_ultimas(df)
+    # TR-0: gana la fechada; TR-1: 2021 sobre el respaldo en Fecha de Informe; TR-2: solo sin fecha
+    assert ult["H2"].tolist() == [1.0, 4.0, 5.0], ult
+    incremental = uf.actualizar_ultimas(uf.actualizar_ultimas(None, df.iloc[:2]), df.iloc[2:])
+    assert incremental.drop(columns=["_FechaM_dt", "_FechaI_dt"]).equals(ult)
+
+    original = uf.OUT_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        uf.OUT_FILE = Path(tmp) / "stream.xlsx"
+        try:
+            uf.escribir_excel_stream([crudo.iloc[:2], crudo.iloc[2:]])
+            stream = pd.read_excel(uf.OUT_FILE, sheet_name="UltimaPorTrafo")
+        finally:
+            uf.OUT_FILE = original
+    assert stream["H2"].tolist() == [1.0, 4.0, 5.0], stream
+    print("✅ UltimaPorTrafo con muestras sin fecha: batch, incremental y streaming coinciden")
+
+# ================= SESIONES =================
+def sesion(app_py: str, semilla: int):
+    """Una sesión completa: login, filtros, búsqueda, pestañas y PDF.
+
+    Es un generador: entrega (paso, segundos) después de cada rerun, para que `medir`
+    pueda intercalar varias sesiones vivas en el mismo proceso.
+    """
+    from streamlit.testing.v1 import AppTest
+    rnd = random.Random(semilla)
+
+    def paso(at, nombre):
+        t0 = time.perf_counter()
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"{nombre}: {at.exception[0].value}")
+        return nombre, time.perf_counter() - t0
+
+    login = AppTest.from_file(app_py, default_timeout=300)
+    yield paso(login, "inicio")
+    login.text_input[0].input("cemex")
+    login.text_input[1].input("1234")
+    login.button[0].click()
+    yield paso(login, "login")
+    if not login.session_state["logged_in"]:
+        raise RuntimeError("login rechazado")
+    # AppTest conserva los widgets del login tras st.rerun() (el navegador los limpia);
+    # se sigue con un árbol nuevo sobre la sesión ya autenticada
+    at = AppTest.from_file(app_py, default_timeout=300)
+    at.session_state["logged_in"] = True
+    yield paso(at, "dashboard")
+
+    plantas = at.sidebar.multiselect[0].options
+    at.sidebar.multiselect[0].set_value(rnd.sample(plantas, min(len(plantas), rnd.randint(1, 3))))
+    yield paso(at, "filtro plantas")
+    at.sidebar.multiselect[1].set_value(["Preocupante", "Crítico"])
+    yield paso(at, "filtro IEEE")
+    at.sidebar.text_input[0].input(f"TR-{rnd.randint(0, 99)}")
+    yield paso(at, "búsqueda")
+    at.sidebar.text_input[0].input("")
+    yield paso(at, "búsqueda vacía")
+    at.selectbox[0].set_value(rnd.choice(plantas))
+    yield paso(at, "pestaña detalle")
+    at.radio[0].set_value("Histórico completo")
+    yield paso(at, "pestaña what-if")
+    next(b for b in at.button if b.label == "Generar PDF").click()
+    yield paso(at, "PDF")
+
+def _rss_pico_mb() -> float:
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 ** 2 if sys.platform == "darwin" else 1024)  # macOS informa bytes, Linux KB
+
+def medir(carpeta: Path, sesiones: int) -> dict:
+    """`sesiones` sesiones vivas a la vez en este proceso (una medición por proceso).
+
+    AppTest no admite correr en paralelo (usa un runtime global), así que cada ronda
+    simula que todas las sesiones piden su siguiente rerun al mismo tiempo y los
+    atiende en serie, en orden aleatorio, como un proceso limitado por el GIL:
+    la latencia de respuesta es la espera en cola más el propio rerun.
+    """
+    os.chdir(carpeta)  # los PDF se guardan en el directorio actual
+    sys.path.insert(0, str(carpeta))
+    app_py = str(carpeta / "app.py")
+    rss0 = _rss_pico_mb()
+    rnd = random.Random(0)
+    activas = [sesion(app_py, i) for i in range(sesiones)]
+    rerun, respuesta, primera = [], [], 0.0
+    t0 = time.perf_counter()
+    while activas:
+        rnd.shuffle(activas)
+        cola, siguen = 0.0, []
+        for s in activas:
+            try:
+                nombre, seg = next(s)
+            except StopIteration:
+                continue
+            cola += seg
+            rerun.append(seg)
+            respuesta.append(cola)
+            if nombre == "inicio":
+                primera = max(primera, seg)
+            siguen.append(s)
+        activas = siguen
+    total = time.perf_counter() - t0
+    rerun, respuesta = np.array(rerun) * 1000, np.array(respuesta) * 1000
+    return {
+        "sesiones": sesiones, "reruns": len(rerun),
+        "rerun_p50_ms": round(float(np.percentile(rerun, 50)), 1),
+        "rerun_p95_ms": round(float(np.percentile(rerun, 95)), 1),
+        "resp_p50_ms": round(float(np.percentile(respuesta, 50)), 1),
+        "resp_p95_ms": round(float(np.percentile(respuesta, 95)), 1),
+        "inicio_ms": round(primera * 1000, 1), "total_s": round(total, 2),
+        "rss_inicial_mb": round(rss0, 1), "rss_pico_mb": round(_rss_pico_mb(), 1),
+    }
+
+# ================= MAIN =================
+def _opcion(nombre, defecto):
+    if nombre in sys.argv and sys.argv.index(nombre) + 1 < len(sys.argv):
+        return sys.argv[sys.argv.index(nombre) + 1]
+    return defecto
+
+def main():
+    if "--verificar" in sys.argv:
+        verificar_ultimas()
+        return
+    if "--medir" in sys.argv:  # proceso hijo: una celda de la tabla
+        i = sys.argv.index("--medir")
+        print(json.dumps(medir(Path(sys.argv[i + 1]), int(sys.argv[i + 2]))))
+        return
+
+    flotas = [int(x) for x in _opcion("--flota", ",".join(map(str, FLOTAS))).split(",")]
+    sesiones = [int(x) for x in _opcion("--sesiones", ",".join(map(str, SESIONES))).split(",")]
+    modo = _opcion("--modo", "part")
+    salida = _opcion("--csv", None)
+
+    verificar_ultimas()  # el fixture pasa por el mismo pipeline: si falla, las mediciones no valen
+    filas = []
+    with tempfile.TemporaryDirectory(prefix="carga_trafos_") as tmp:
+        for n in flotas:
+            carpeta = Path(tmp) / f"flota_{n}"
+            print(f"🧪 Fixture: {n} trafos × {MUESTRAS} muestras (modo {modo})")
+            armar_fixture(n, carpeta, modo)
+            for s in sesiones:
+                # Un proceso por medición: la memoria pico no arrastra corridas anteriores
+                r = subprocess.run([sys.executable, str(Path(__file__).resolve()), "--medir", str(carpeta), str(s)],
+                                   capture_output=True, text=True)
+                if r.returncode:
+                    print(f"❌ flota {n}, {s} sesiones:\n{r.stderr[-2000:]}")
+                    continue
+                fila = {"flota": n, "modo": modo, **json.loads(r.stdout.strip().splitlines()[-1])}
+                filas.append(fila)
+                print(f"   {s:>3} sesiones | rerun p50/p95 {fila['rerun_p50_ms']}/{fila['rerun_p95_ms']} ms | "
+                      f"respuesta p50/p95 {fila['resp_p50_ms']}/{fila['resp_p95_ms']} ms | RSS pico {fila['rss_pico_mb']} MB")
+
+    if not filas:
+        return
+    tabla = pd.DataFrame(filas)
+    print("\n" + tabla.to_string(index=False))
+    if salida:
+        tabla.to_csv(salida, index=False)
+        print(f"✅ Resultados en {salida}")
+
+if __name__ == "__main__":
+    main()
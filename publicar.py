@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+from pathlib import Path
+import os, shutil, sys, time, traceback, zipfile
+import pandas as pd
+import ultimafecha as uf
+from datos import (SNAP_DIR, unir_diagnosticos, escribir_sqlite, escribir_arrow, escribir_particiones,
+                   particiones_vigentes)
+from umbrales import tabla_gases
+
+# ================= RUTAS =================
+# SNAP_DIR viene de datos.py: la misma carpeta (data/snapshots junto a los scripts) que
+# leen app.py y api.py. --destino solo hace falta para publicar en otro lado.
+ACTUAL = "ACTUAL"          # puntero con el número de la última versión publicada
+CONSERVAR = 3              # versiones que se dejan en disco (sesiones abiertas pueden seguir leyéndolas)
+INTERVALO = 60             # segundos entre sondeos en modo --watch
+MAX_FALLOS = 3             # intentos sobre la misma versión de un libro antes de dejarlo de lado
+ARCHIVOS = ("trafos_maestro_tabla.xlsx", "trafos.sqlite", "trafos.arrow", "particiones",
+            "gases_ultimas.arrow", "gases_historico.arrow")  # nombres que busca app.py
+AUX = ["_FechaM_dt", "_FechaI_dt"]
+
+# ================= SNAPSHOTS =================
+def carpeta(destino, version: int) -> Path:
+    return Path(destino) / f"v{version:06d}"
+
+def version_actual(destino=None) -> int:
+    """Última versión publicada según ACTUAL (0 si todavía no hay ninguna)."""
+    try:
+        return int((Path(destino or SNAP_DIR) / ACTUAL).read_text().strip())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def _siguiente_version(destino: Path) -> int:
+    existentes = [int(p.name[1:]) for p in destino.glob("v*") if p.name[1:].isdigit()]
+    return max([version_actual(destino), *existentes]) + 1
+
+def _escribir_atomico(path: Path, texto: str):
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(texto)
+    os.replace(tmp, path)
+
+def _limpiar(destino: Path, version: int):
+    """Borra versiones viejas (deja las últimas CONSERVAR) y temporales de corridas abortadas."""
+    for p in destino.glob("v*"):
+        if p.name[1:].isdigit() and int(p.name[1:]) <= version - CONSERVAR:
+            shutil.rmtree(p, ignore_errors=True)
+    for p in destino.glob(".v*.tmp"):
+        shutil.rmtree(p, ignore_errors=True)
+
+def _espejo(origen: Path, path: Path):
+    """Copia el Excel publicado a OUT_FILE sin dejarlo a medias (para los scripts sueltos)."""
+    tmp = path.with_name(f".{path.stem}.tmp{path.suffix}")
+    shutil.copyfile(origen, tmp)
+    os.replace(tmp, path)
+
+def publicar(datos: pd.DataFrame, ult: pd.DataFrame, hojas: dict, destino=None) -> int:
+    """Publica Excel + SQLite + Arrow (completo y por planta) como una versión nueva y completa.
+
+    Todo se escribe en una carpeta oculta que se renombra a vNNNNNN al terminar;
+    recién entonces se mueve el puntero ACTUAL. Un lector que resuelve ACTUAL
+    nunca ve una versión a medio escribir.
+    """
+    destino = Path(destino or SNAP_DIR)
+    destino.mkdir(parents=True, exist_ok=True)
+    version = _siguiente_version(destino)
+    tmp = destino / f".v{version:06d}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+
+    xlsx, db, arrow, particiones, gases_ult, gases_hist = (tmp / n for n in ARCHIVOS)
+    uf.escribir_excel(datos, ult, xlsx, hojas)
+    flota = unir_diagnosticos(hojas)
+    escribir_sqlite(datos, db)
+    escribir_arrow(flota, arrow)
+    # Los agregados de plantas sin cambios se copian de la versión publicada anterior
+    anterior = version_actual(destino)
+    previa = particiones_vigentes(carpeta(destino, anterior) / "particiones") if anterior else None
+    escribir_particiones(flota, particiones, previa)
+    escribir_arrow(tabla_gases(ult), gases_ult)
+    escribir_arrow(tabla_gases(datos), gases_hist)
+    (tmp / "VERSION").write_text(f"{version}\n")
+
+    final = carpeta(destino, version)
+    tmp.rename(final)
+    _escribir_atomico(destino / ACTUAL, f"{version}\n")
+    _espejo(final / ARCHIVOS[0], uf.OUT_FILE)
+    _limpiar(destino, version)
+    return version
+
+# ================= ETAPAS POR PLANTA =================
+def firmas(pares) -> dict:
+    """planta -> (archivo, mtime, tamaño); cambia cuando OneDrive sincroniza una versión nueva."""
+    out = {}
+    for planta, xlsm in pares:
+        try:
+            st = xlsm.stat()
+        except FileNotFoundError:
+            continue
+        out[planta] = (str(xlsm), st.st_mtime_ns, st.st_size)
+    return out
+
+def procesar_plantas(pares, cache: dict):
+    """Re-ingesta solo `pares` y recalcula sus últimas muestras y diagnósticos.
+
+    `cache` guarda por planta: datos, última muestra por trafo y auditoría. La planta
+    se vuelve a leer entera, así que su UltimaPorTrafo se recalcula (O(n), sin ordenar).
+    """
+    auditoria = []
+    df = uf.build_maestro(auditoria, pares)
+    for planta, _ in pares:
+        datos = df[df["Planta"] == planta] if not df.empty else df
+        cache[planta] = {
+            "datos": datos.reset_index(drop=True),
+            "ult": uf.calcular_ultimas(datos),
+            "auditoria": [a for a in auditoria if a["Planta"] == planta],
+        }
+
+def ensamblar(cache: dict, cambiadas) -> tuple:
+    """Une las plantas en (Datos, UltimaPorTrafo, hojas de diagnóstico).
+
+    Los diagnósticos se recalculan solo para las plantas en `cambiadas`;
+    el resto se reutiliza de la corrida anterior.
+    """
+    plantas = [p for p in sorted(cache) if not cache[p]["datos"].empty]
+    if not plantas:
+        return pd.DataFrame(), pd.DataFrame(), {}
+    datos = pd.concat([cache[p]["datos"] for p in plantas], ignore_index=True)
+    cols = [c for c in datos.columns if c not in AUX]
+    datos = pd.concat([datos[cols].fillna("NA"), datos[[c for c in AUX if c in datos.columns]]], axis=1)
+
+    for p in plantas:
+        if p in cambiadas or "diag" not in cache[p]:
+            cache[p]["diag"] = uf.calcular_diagnosticos(cache[p]["ult"].reindex(columns=cols, fill_value="NA"))
+    ult = pd.concat([cache[p]["ult"] for p in plantas], ignore_index=True).reindex(columns=cols).fillna("NA")
+    ult = ult.sort_values(uf.COLS_KEY).reset_index(drop=True)
+    hojas = {h: pd.concat([cache[p]["diag"][h] for p in plantas], ignore_index=True)
+             for h in cache[plantas[0]]["diag"]}
+    return datos, ult, hojas
+
+# ================= MODO WATCH =================
+def _fallo(planta: str, firma, error: Exception, fallos: dict):
+    """Registra un error al procesar `planta` y cuenta los intentos sobre la misma firma."""
+    previa, n = fallos.get(planta, (None, 0))
+    n = n + 1 if previa == firma else 1
+    fallos[planta] = (firma, n)
+    if isinstance(error, (OSError, zipfile.BadZipFile)):
+        # Libro bloqueado o a medio sincronizar: suele resolverse solo
+        print(f"⚠️ {planta}: no se pudo leer ({error}); intento {n}/{MAX_FALLOS}.")
+    else:
+        print(f"❌ {planta}: error al procesar (intento {n}/{MAX_FALLOS}):")
+        traceback.print_exc()
+    if n >= MAX_FALLOS:
+        print(f"⛔ {planta}: se omite hasta que cambie el archivo.")
+
+def ciclo(estado: dict, destino=None, forzar=False) -> int:
+    """Un sondeo: detecta plantas nuevas/modificadas/eliminadas y publica si hubo cambios.
+
+    Un archivo se procesa cuando su firma se repite en dos sondeos seguidos, para
+    no leer un libro que OneDrive todavía está descargando. Una planta que falla
+    MAX_FALLOS veces con la misma firma se deja de lado hasta que el archivo cambie.
+    Devuelve la versión publicada, o 0 si no hubo cambios.
+    """
+    pares = dict(uf.descubrir_archivos())
+    actuales = firmas(pares.items())
+    cache, vistas, pendientes, fallos = estado["cache"], estado["firmas"], estado["pendientes"], estado["fallos"]
+
+    listas = []
+    for planta, firma in actuales.items():
+        if vistas.get(planta) == firma:
+            pendientes.pop(planta, None)
+        elif fallos.get(planta, (None, 0))[0] == firma and fallos[planta][1] >= MAX_FALLOS:
+            continue  # ya falló demasiadas veces con este mismo archivo
+        elif forzar or pendientes.get(planta) == firma:
+            listas.append(planta)
+        else:
+            pendientes[planta] = firma
+    borradas = [p for p in cache if p not in actuales]
+    if not listas and not borradas:
+        return 0
+
+    for p in borradas:
+        print(f"🗑️ {p}: ya no está en origen, se quita del snapshot.")
+        cache.pop(p)
+        vistas.pop(p, None)
+    procesadas = []
+    if listas:
+        print(f"🔄 Cambios en: {', '.join(listas)}")
+    for p in listas:
+        # Planta por planta: un libro con problemas no frena la publicación del resto
+        try:
+            procesar_plantas([(p, pares[p])], cache)
+        except Exception as e:
+            _fallo(p, actuales[p], e, fallos)
+            continue
+        vistas[p] = actuales[p]
+        pendientes.pop(p, None)
+        fallos.pop(p, None)
+        procesadas.append(p)
+    if not procesadas and not borradas:
+        return 0
+
+    datos, ult, hojas = ensamblar(cache, set(procesadas))
+    if datos.empty:
+        print("⚠️ No hubo datos para publicar.")
+        return 0
+    uf.guardar_auditoria([a for p in sorted(cache) for a in cache[p]["auditoria"]])
+    version = publicar(datos, ult, hojas, destino)
+    print(f"✅ Snapshot v{version} publicado ({len(datos)} filas, {len(ult)} trafos) → {carpeta(destino or SNAP_DIR, version)}")
+    return version
+
+def vigilar(destino=None, intervalo=INTERVALO):
+    """Sondea las carpetas de planta y publica un snapshot nuevo ante cada cambio."""
+    estado = {"cache": {}, "firmas": {}, "pendientes": {}, "fallos": {}}
+    ciclo(estado, destino, forzar=True)
+    print(f"👀 Vigilando cambios cada {intervalo}s (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(intervalo)
+            ciclo(estado, destino)
+    except KeyboardInterrupt:
+        print("👋 Fin del modo watch.")
+
+# ================= MAIN =================
+def _opcion(nombre, defecto=None):
+    if nombre in sys.argv:
+        i = sys.argv.index(nombre)
+        if i + 1 < len(sys.argv):
+            return sys.argv[i + 1]
+    return defecto
+
+def main():
+    destino = _opcion("--destino", SNAP_DIR)
+    if "--watch" in sys.argv:
+        vigilar(destino, float(_opcion("--intervalo", INTERVALO)))
+        return
+    estado = {"cache": {}, "firmas": {}, "pendientes": {}, "fallos": {}}
+    if not ciclo(estado, destino, forzar=True):
+        print("⚠️ No se publicó ningún snapshot.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import numpy as np
+import pandas as pd
+from openpyxl.formatting.rule import Rule
+from openpyxl.styles import PatternFill
+from openpyxl.styles.differential import DifferentialStyle
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.table import Table, TableStyleInfo
+
+# ================= COLORES =================
+VERDE, AMARILLO, ROJO, AZUL = "C6EFCE", "FFF2CC", "FFC7CE", "9AD0F5"
+
+# Reglas (texto contenido, color) en orden de prioridad, como los if/elif originales
+COLORES_ESTADO = [("Normal", VERDE), ("Preocupante", AMARILLO), ("Crítico", ROJO)]
+COLORES_FALLA = [("T1", VERDE), ("T2", AMARILLO), ("T3", ROJO), ("D2", ROJO), ("DT", ROJO)]
+
+# ================= XLSXWRITER =================
+def escribir_hoja(ws, fila0, df: pd.DataFrame, cols):
+    """Escribe `df` fila a fila (compatible con constant_memory) desde `fila0`."""
+    vals = df.reindex(columns=cols, fill_value="NA").astype(object)
+    vals = vals.where(vals.notna(), None).mask(vals.isin([np.inf]), "inf").mask(vals.isin([-np.inf]), "-inf")
+    for i, fila in enumerate(vals.itertuples(index=False), start=fila0):
+        ws.write_row(i, 0, fila)
+    return fila0 + len(vals)
+
+def colorear(wb, ws, nrows, cols, cols_color, colores, formatos):
+    """Una regla de formato condicional por color y columna, en vez de un relleno por celda.
+
+    `formatos` guarda los formatos ya creados en `wb` para no duplicarlos entre hojas.
+    """
+    if nrows == 0:
+        return
+    for col in cols_color:
+        if col not in cols:
+            continue
+        j = cols.index(col)
+        for texto, color in colores:
+            if color not in formatos:
+                formatos[color] = wb.add_format({"bg_color": f"#{color}"})
+            ws.conditional_format(1, j, nrows, j, {
+                "type": "text", "criteria": "containing", "value": texto, "format": formatos[color],
+            })
+
+def hoja_completa(wb, nombre, df: pd.DataFrame, cols_color=(), colores=(), formatos=None):
+    """Agrega una hoja con encabezado, datos, autofiltro y colores por rango."""
+    cols = [str(c) for c in df.columns]
+    ws = wb.add_worksheet(nombre)
+    ws.write_row(0, 0, cols)
+    escribir_hoja(ws, 1, df, list(df.columns))
+    # add_table() no está soportado en constant_memory; basta con autofiltro
+    ws.autofilter(0, 0, len(df), max(len(cols) - 1, 0))
+    colorear(wb, ws, len(df), cols, cols_color, colores, {} if formatos is None else formatos)
+    return ws
+
+# ================= OPENPYXL (scripts sueltos) =================
+def reemplazar_hoja(path, nombre, df: pd.DataFrame, cols_color=(), colores=(), tabla=None):
+    """Reescribe una sola hoja de un libro existente, con tabla y colores por rango,
+    sin volver a abrir el libro para recorrer celdas."""
+    with pd.ExcelWriter(path, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
+        df.to_excel(writer, index=False, sheet_name=nombre)
+        ws = writer.sheets[nombre]
+        nrows, ncols = df.shape
+        if tabla and nrows:
+            t = Table(displayName=tabla, ref=f"A1:{get_column_letter(ncols)}{nrows + 1}")
+            t.tableStyleInfo = TableStyleInfo(name="TableStyleMedium9", showRowStripes=True)
+            ws.add_table(t)
+        if not nrows:
+            return
+        for col in cols_color:
+            if col not in df.columns:
+                continue
+            letra = get_column_letter(df.columns.get_loc(col) + 1)
+            rango = f"{letra}2:{letra}{nrows + 1}"
+            for texto, color in colores:
+                regla = Rule(type="containsText", operator="containsText", text=texto,
+                             dxf=DifferentialStyle(fill=PatternFill(bgColor=color, fill_type="solid")))
+                regla.formula = [f'NOT(ISERROR(SEARCH("{texto}",{letra}2)))']
+                ws.conditional_formatting.add(rango, regla)
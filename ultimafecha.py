@@ -2,14 +2,23 @@
 from pathlib import Path
 from openpyxl import load_workbook
 from openpyxl.utils import column_index_from_string
+import numpy as np
 import pandas as pd
-import unicodedata, re, sys
+import xlsxwriter
+import unicodedata, re, sys, tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from itertools import islice
+from salida_excel import escribir_hoja, hoja_completa
+import estados, Diag_3r, iec, duval
 
 # ================= RUTAS BASE =================
 BASE = Path("/Users/joseluisgiadanscastellanos/Library/CloudStorage/OneDrive-CEMEX/OneDrive_Cemex")
 OUT_DIR = BASE / "Codigos/out"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 OUT_FILE = OUT_DIR / "trafos_maestro_tabla.xlsx"
+AUDIT_FILE = OUT_DIR / "auditoria_ingesta.csv"
 
 # ============== CONFIG TABLA DGA ==============
 SRC_FIRST_DATA_ROW = 16
@@ -108,51 +117,96 @@ def leer_pares_indice_wb(wb):
 # ============== UTILIDADES DGA ===============
 REF_TOKENS = {"100", "-", "120", "350", "2500", "50", "65", "35", "720"}
 
-def es_fila_referencia(vals):
-    tokens = [str(v).strip().lower() for v in vals if v not in (None, "")]
-    if not tokens:
-        return True
-    ref_hits = sum(t in REF_TOKENS for t in tokens)
-    non_ref = len(tokens) - ref_hits
-    return ref_hits >= 6 and non_ref <= 2
+def _textos(bloque: np.ndarray) -> np.ndarray:
+    """Equivalente vectorizado de `_norm_str` sobre un arreglo 2-D de celdas."""
+    txt = np.where(pd.isnull(bloque), "", bloque).astype(str)
+    if not txt.size:
+        return txt
+    return np.char.strip(np.char.replace(txt, "\n", " "))
 
 def leer_bloque_dga(ws):
+    """Lee el bloque AT..BH de una hoja como un solo arreglo 2-D.
+
+    Devuelve (headers, datos, rechazos): `datos` son las filas válidas hasta la primera
+    fila vacía (terminador), sin filas de referencia; `rechazos` cuenta lo descartado.
+    """
     start_col = column_index_from_string(SRC_START_COL)
     end_col = column_index_from_string(SRC_LAST_COL)
-    headers = [ws.cell(SRC_FIRST_DATA_ROW - 1, c).value for c in range(start_col, end_col + 1)]
-    headers = [(_norm_str(h) or f"Col{i+1}") for i, h in enumerate(headers)]
-
-    registros = []
-    r = SRC_FIRST_DATA_ROW
-    max_r = ws.max_row
-    while r <= max_r:
-        row_vals = [ws.cell(r, c).value for c in range(start_col, end_col + 1)]
-        if all(_norm_str(v) in ("", "0") for v in row_vals):
-            break
-        if es_fila_referencia(row_vals):
-            r += 1
-            continue
-        registros.append(row_vals)
-        r += 1
-    return headers, registros
+    filas = list(ws.iter_rows(min_row=SRC_FIRST_DATA_ROW - 1, max_row=ws.max_row,
+                              min_col=start_col, max_col=end_col, values_only=True))
+    ncols = end_col - start_col + 1
+    bloque = np.empty((len(filas), ncols), dtype=object)
+    for i, fila in enumerate(filas):
+        bloque[i, :len(fila)] = fila
+
+    encabezado = _textos(bloque[:1])[0] if len(filas) else [""] * ncols
+    headers = [(str(h) or f"Col{i+1}") for i, h in enumerate(encabezado)]
+    cuerpo = bloque[1:]
+    txt = _textos(cuerpo)
+
+    # Terminador: primera fila con todas las celdas vacías o "0"
+    vacia = np.isin(txt, ("", "0")).all(axis=1)
+    fin = int(np.argmax(vacia)) if vacia.any() else len(cuerpo)
+
+    # Filas de referencia (límites impresos en la plantilla): ≥6 tokens de REF_TOKENS
+    # y a lo sumo 2 que no lo sean; una fila sin tokens también se descarta
+    presentes = ~(pd.isnull(cuerpo[:fin]) | (cuerpo[:fin] == ""))
+    tokens = np.char.lower(txt[:fin]) if fin else txt[:0]
+    hits = (presentes & np.isin(tokens, list(REF_TOKENS))).sum(axis=1)
+    n_tok = presentes.sum(axis=1)
+    es_ref = (n_tok == 0) | ((hits >= 6) & (n_tok - hits <= 2))
+
+    rechazos = {
+        "Filas válidas": int((~es_ref).sum()),
+        "Referencia descartadas": int(es_ref.sum()),
+        "Tras terminador": int((~vacia[fin + 1:]).sum()),
+    }
+    return headers, cuerpo[:fin][~es_ref], rechazos
 
 # ============== PIPELINE =====================
-def build_maestro() -> pd.DataFrame:
-    """Lee TODAS las plantas y construye el maestro completo."""
-    all_rows = []
-    headers_global = None
+COLS_KEY = ["Planta", "Transformador", "Ubicacion"]
+DIAGNOSTICOS = [estados, Diag_3r, iec, duval]  # en el orden de hojas del libro
+OPCIONES_XLSX = {"constant_memory": True, "default_date_format": "dd-mmm-yy"}
 
+PREFETCH = 3  # libros que se leen por adelantado mientras se parsea el actual
+
+def descubrir_archivos():
+    """Lista (planta, xlsm) de todas las carpetas antes de empezar a parsear."""
+    pares = []
     for folder in sorted(BASE.glob("* - Captura de datos")):
         archivos = [f for f in folder.glob("*.xlsm") if "transfor" in f.name.lower()]
         if not archivos:
             print(f"⚠️ {folder.name}: no hay archivo de transformadores, se omite.")
             continue
+        pares.append((folder.name.split(" - ")[0], archivos[0]))
+    return pares
 
-        xlsm = archivos[0]
-        planta = folder.name.split(" - ")[0]
+def iter_libros(pares, n=PREFETCH):
+    """Entrega (planta, xlsm, bytes en memoria) leyendo los siguientes `n` libros en hilos.
+
+    Así la lectura desde OneDrive se solapa con el parseo del libro actual.
+    """
+    pendientes = iter(pares)
+    cola = deque()
+    with ThreadPoolExecutor(max_workers=max(n, 1)) as pool:
+        for planta, xlsm in islice(pendientes, max(n, 1)):
+            cola.append((planta, xlsm, pool.submit(xlsm.read_bytes)))
+        while cola:
+            planta, xlsm, fut = cola.popleft()
+            sig = next(pendientes, None)
+            if sig is not None:
+                cola.append((*sig, pool.submit(sig[1].read_bytes)))
+            yield planta, xlsm, BytesIO(fut.result())
+
+def iter_bloques(auditoria: list = None, pares: list = None):
+    """Recorre las plantas (TODAS, o solo `pares`) y entrega un DataFrame crudo por hoja de transformador.
+
+    Si se pasa `auditoria`, se agrega un registro por hoja con las filas descartadas.
+    """
+    for planta, xlsm, buf in iter_libros(descubrir_archivos() if pares is None else pares):
         print(f"📄 Procesando: {planta} ({xlsm.name})")
 
-        wb = load_workbook(xlsm, data_only=True, read_only=True, keep_links=False)
+        wb = load_workbook(buf, data_only=True, read_only=True, keep_links=False)
         indice_pares = leer_pares_indice_wb(wb)
         print(f"📑 Índice: {len(indice_pares)} transformadores válidos")
 
@@ -165,22 +219,24 @@ def build_maestro() -> pd.DataFrame:
             if (_key(nom), _key(ubi)) not in indice_pares:
                 continue
 
-            headers, regs = leer_bloque_dga(ws)
-            if not regs:
+            headers, datos, rechazos = leer_bloque_dga(ws)
+            if auditoria is not None:
+                auditoria.append({"Planta": planta, "Hoja": ws.title, "Transformador": _norm_str(nom),
+                                  "Ubicacion": _norm_str(ubi), **rechazos})
+            if not len(datos):
                 continue
-            if headers_global is None:
-                headers_global = headers
 
-            for fila in regs:
-                row = {"Planta": planta, "Transformador": _norm_str(nom), "Ubicacion": _norm_str(ubi)}
-                row.update({h: v for h, v in zip(headers, fila)})
-                all_rows.append(row)
-
-    if not all_rows:
-        print("⚠️ No se obtuvieron registros válidos.")
-        return pd.DataFrame()
-
-    df = pd.DataFrame(all_rows)
+            # Encabezados repetidos: conserva la posición del primero y el valor del último
+            pos = {h: i for i, h in enumerate(headers)}
+            lote = pd.DataFrame(datos[:, list(pos.values())], columns=list(pos)).infer_objects()
+            lote.insert(0, "Planta", planta)
+            lote.insert(1, "Transformador", _norm_str(nom))
+            lote.insert(2, "Ubicacion", _norm_str(ubi))
+            yield lote
+        wb.close()
+
+def normalizar_lote(df: pd.DataFrame) -> pd.DataFrame:
+    """Renombra columnas, quita las de % y normaliza fechas de un lote de muestras."""
     rename_map = {"Col1": "Compañía de Análisis", "Col2": "Fecha de Muestra", "Col3": "Fecha de Informe"}
     df = df.rename(columns=rename_map)
 
@@ -212,57 +268,166 @@ def build_maestro() -> pd.DataFrame:
     df = df.fillna("NA").replace("", "NA")
     return df
 
+def build_maestro(auditoria: list = None, pares: list = None) -> pd.DataFrame:
+    """Lee TODAS las plantas (o solo `pares`) y construye el maestro completo."""
+    lotes = list(iter_bloques(auditoria, pares))
+    if not lotes:
+        print("⚠️ No se obtuvieron registros válidos.")
+        return pd.DataFrame()
+    return normalizar_lote(pd.concat(lotes, ignore_index=True))
+
+def _fechas_muestra(df: pd.DataFrame) -> pd.Series:
+    """'_FechaM_dt' si existe; si no, Fecha de Muestra con respaldo en Fecha de Informe.
+
+    `normalizar_lote` rellena con "NA" las muestras sin ninguna fecha, así que
+    siempre se vuelve a convertir: "NA" queda como NaT.
+    """
+    if "_FechaM_dt" in df.columns:
+        return pd.to_datetime(df["_FechaM_dt"].where(df["_FechaM_dt"].ne("NA")), errors="coerce")
+    fm = pd.to_datetime(df.get("Fecha de Muestra", pd.Series(index=df.index, dtype=object)), dayfirst=True, errors="coerce")
+    if "Fecha de Informe" in df.columns:
+        fm = fm.fillna(pd.to_datetime(df["Fecha de Informe"], dayfirst=True, errors="coerce"))
+    return fm
+
+def _idx_ultimas(df: pd.DataFrame) -> np.ndarray:
+    """Posición de la muestra más reciente por trafo en O(n) (argmax por grupo, sin ordenar).
+
+    NaT cuenta como la fecha más antigua y, en empate, gana la última fila ingresada.
+    """
+    codigos = df.groupby(COLS_KEY, sort=False, dropna=False).ngroup().to_numpy()
+    fechas = _fechas_muestra(df).to_numpy("datetime64[ns]").view("i8")
+    n_grupos = codigos.max() + 1
+    maximo = np.full(n_grupos, np.iinfo("i8").min)
+    np.maximum.at(maximo, codigos, fechas)
+    candidatas = np.flatnonzero(fechas == maximo[codigos])
+    pos = np.full(n_grupos, -1)
+    np.maximum.at(pos, codigos[candidatas], candidatas)
+    return pos
+
+def _sin_auxiliares(df: pd.DataFrame) -> pd.DataFrame:
+    return df.drop(columns=[c for c in ("_FechaM_dt", "_FechaI_dt") if c in df.columns])
+
+# ============== ÍNDICE INCREMENTAL ===========
+def actualizar_ultimas(indice, nuevas: pd.DataFrame) -> pd.DataFrame:
+    """Últimas muestras (una fila por trafo, con '_FechaM_dt') tras sumar `nuevas`.
+
+    El modo streaming la avanza lote a lote, así que el costo por lote depende de las
+    filas nuevas y del número de trafos, no del histórico. Solo avanza: `indice=None`
+    parte de cero.
+    """
+    nuevas = nuevas.assign(_FechaM_dt=_fechas_muestra(nuevas))
+    if indice is not None and not indice.empty:
+        nuevas = pd.concat([indice, nuevas], ignore_index=True)
+    if nuevas.empty:
+        return nuevas
+    return nuevas.iloc[_idx_ultimas(nuevas)].sort_values(COLS_KEY).reset_index(drop=True)
+
 def calcular_ultimas(df: pd.DataFrame) -> pd.DataFrame:
     """Una fila por trafo (Planta/Transformador/Ubicacion) con la última 'Fecha de Muestra'."""
     if df.empty:
         return df
-
-    if "_FechaM_dt" not in df.columns:
-        base = pd.to_datetime(df.get("Fecha de Muestra"), dayfirst=True, errors="coerce")
-        df = df.assign(_FechaM_dt=base)
-
-    cols_key = ["Planta", "Transformador", "Ubicacion"]
-    df_sorted = df.sort_values(cols_key + ["_FechaM_dt"], ascending=[True, True, True, True])
-    ult = df_sorted.drop_duplicates(subset=cols_key, keep="last").copy()
-    ult = ult.sort_values(cols_key).reset_index(drop=True)
-
-    if "_FechaI_dt" in ult.columns:
-        ult = ult.drop(columns=["_FechaI_dt"])
-    if "_FechaM_dt" in ult.columns:
-        ult = ult.drop(columns=["_FechaM_dt"])
-    return ult
-
-def escribir_excel(df_datos: pd.DataFrame, df_ult: pd.DataFrame):
-    """Crea todas las hojas requeridas por la app."""
-    with pd.ExcelWriter(OUT_FILE, engine="xlsxwriter") as writer:
-        # ---- Datos ----
-        df_datos.to_excel(writer, index=False, sheet_name="Datos")
-        ws = writer.sheets["Datos"]
-        nrows, ncols = df_datos.shape
-        ws.add_table(0, 0, nrows, ncols - 1, {
-            "columns": [{"header": c} for c in df_datos.columns],
-            "name": "TablaDatos",
-            "style": "Table Style Medium 9"
-        })
-
-        # ---- UltimaPorTrafo ----
-        df_ult.to_excel(writer, index=False, sheet_name="UltimaPorTrafo")
-        ws2 = writer.sheets["UltimaPorTrafo"]
-        nrows2, ncols2 = df_ult.shape
-        ws2.add_table(0, 0, nrows2, ncols2 - 1, {
-            "columns": [{"header": c} for c in df_ult.columns],
-            "name": "TablaUltimas",
-            "style": "Table Style Medium 9"
-        })
-
-        # ---- Crear hojas vacías requeridas ----
-        for hoja in ["Estados", "Diag_3Ratios", "Diag_IEC", "Diag_Duval"]:
-            df_vacio = pd.DataFrame(columns=["Planta", "Transformador", "Ubicacion", f"Diagnóstico {hoja.split('_')[-1]}"])
-            df_vacio.to_excel(writer, index=False, sheet_name=hoja)
+    return _sin_auxiliares(actualizar_ultimas(None, df))
+
+# ============== ESCRITURA ===================
+def calcular_diagnosticos(df_ult: pd.DataFrame) -> dict:
+    """Hoja de diagnóstico -> DataFrame, calculadas sobre UltimaPorTrafo."""
+    base = df_ult.mask(df_ult.eq("NA"))  # "NA" -> NaN, igual que al releer UltimaPorTrafo con read_excel
+    return {mod.HOJA: mod.calcular(base) for mod in DIAGNOSTICOS}
+
+def _escribir_diagnosticos(wb, hojas: dict, formatos: dict):
+    """Escribe las hojas de diagnóstico en la misma pasada que 'Datos'."""
+    for mod in DIAGNOSTICOS:
+        hoja_completa(wb, mod.HOJA, hojas[mod.HOJA], mod.COLS_COLOR, mod.COLORES, formatos)
+
+def _temporal(path: Path) -> Path:
+    """Ruta temporal junto a `path`; se renombra al final para no dejar un libro a medias."""
+    return path.with_name(f".{path.stem}.tmp{path.suffix}")
+
+def escribir_excel(df_datos: pd.DataFrame, df_ult: pd.DataFrame, path=None, hojas: dict = None):
+    """Crea todas las hojas requeridas por la app en una sola pasada (constant_memory).
+
+    `hojas` permite pasar diagnósticos ya calculados; si no, se calculan aquí.
+    """
+    path = Path(path or OUT_FILE)
+    tmp = _temporal(path)
+    wb = xlsxwriter.Workbook(str(tmp), OPCIONES_XLSX)
+    hoja_completa(wb, "Datos", df_datos)
+    hoja_completa(wb, "UltimaPorTrafo", df_ult)
+    _escribir_diagnosticos(wb, calcular_diagnosticos(df_ult) if hojas is None else hojas, {})
+    wb.close()
+    tmp.replace(path)
+
+# ============== MODO STREAMING ===============
+def _a_disco(lotes, carpeta: Path):
+    """Guarda cada lote crudo en `carpeta` y devuelve (archivos, unión de columnas en orden de aparición)."""
+    archivos, cols = [], {}
+    for i, lote in enumerate(lotes):
+        archivos.append(carpeta / f"{i:06d}.pkl")
+        lote.to_pickle(archivos[-1])
+        cols.update(dict.fromkeys(lote.columns))
+    return archivos, list(cols)
+
+def escribir_excel_stream(lotes):
+    """Escribe 'Datos' lote a lote en modo constant_memory y arma 'UltimaPorTrafo' al vuelo.
+
+    Los lotes pasan primero por el temporal local para conocer la unión de columnas antes del
+    encabezado (constant_memory no permite volver a la fila 0); así 'Datos' sale
+    igual que en modo batch aunque una planta traiga columnas que otra no tiene.
+    La memoria queda acotada por el lote más grande y el número de trafos,
+    no por el histórico completo. Devuelve (filas Datos, filas UltimaPorTrafo).
+    """
+    with tempfile.TemporaryDirectory(prefix="lotes_") as tmp:  # disco local, fuera de OneDrive
+        archivos, crudas = _a_disco(lotes, Path(tmp))
+        if not archivos:
+            return 0, 0
+        wb = xlsxwriter.Workbook(str(_temporal(OUT_FILE)), OPCIONES_XLSX)
+        ws = wb.add_worksheet("Datos")
+        cols = indice = None
+        nrow = 1
+        for archivo in archivos:
+            lote = normalizar_lote(pd.read_pickle(archivo).reindex(columns=crudas))
+            if cols is None:
+                cols = list(lote.columns)  # todos los lotes normalizados comparten columnas
+                ws.write_row(0, 0, cols)
+            nrow = escribir_hoja(ws, nrow, lote, cols)
+            indice = actualizar_ultimas(indice, lote)
+
+    # add_table() no está soportado en constant_memory; basta con autofiltro
+    ws.autofilter(0, 0, nrow - 1, len(cols) - 1)
+
+    cols_ult = [c for c in cols if c not in ("_FechaM_dt", "_FechaI_dt")]
+    ult = indice.reindex(columns=cols_ult, fill_value="NA")
+    hoja_completa(wb, "UltimaPorTrafo", ult)
+    _escribir_diagnosticos(wb, calcular_diagnosticos(ult), {})
+    wb.close()
+    _temporal(OUT_FILE).replace(OUT_FILE)
+    return nrow - 1, len(ult)
+
+def guardar_auditoria(auditoria: list):
+    """Guarda y resume las filas descartadas por hoja durante la ingesta."""
+    if not auditoria:
+        return
+    aud = pd.DataFrame(auditoria)
+    aud.to_csv(AUDIT_FILE, index=False)
+    tot = aud[["Filas válidas", "Referencia descartadas", "Tras terminador"]].sum()
+    print(f"🧾 Auditoría: {tot['Filas válidas']} válidas | {tot['Referencia descartadas']} de referencia | "
+          f"{tot['Tras terminador']} tras el terminador → {AUDIT_FILE}")
 
 # ================= MAIN ======================
 def main():
-    df = build_maestro()
+    auditoria = []
+    if "--stream" in sys.argv:
+        n_datos, n_ult = escribir_excel_stream(iter_bloques(auditoria))
+        guardar_auditoria(auditoria)
+        if not n_datos:
+            print("⚠️ No hubo datos para escribir.")
+            return
+        print(f"\n✅ Maestro + Hojas auxiliares generado (streaming): {OUT_FILE}")
+        print(f"   Filas Datos: {n_datos} | Filas UltimaPorTrafo: {n_ult}")
+        return
+
+    df = build_maestro(auditoria)
+    guardar_auditoria(auditoria)
     if df.empty:
         print("⚠️ No hubo datos para escribir.")
         return
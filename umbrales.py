@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+from pathlib import Path
+import json
+import numpy as np
+import pandas as pd
+
+# ================= RUTAS =================
+BASE = Path("/Users/joseluisgiadanscastellanos/Library/CloudStorage/OneDrive-CEMEX/OneDrive_Cemex")
+UMBRALES_FILE = BASE / "Codigos/umbrales.json"
+
+# ================= ESQUEMA =================
+KEY = ["Planta", "Transformador", "Ubicacion"]
+NIVELES = ["Normal", "Preocupante", "Crítico"]
+GASES = ["H2", "CH4", "C2H6", "C2H4", "C2H2", "TDGC"]
+ALIAS = {"TDGC": ["ppm", "TDCG", "TDGC"]}  # mismo orden de búsqueda que estados.calcular
+
+# ================= LÍMITES DE FÁBRICA =================
+# Aquí y no en estados.py / iec.py: la app los importa sin arrastrar openpyxl (salida_excel)
+LIMITES_IEEE = {  # IEEE C57.104
+    "CH4": [(100, "Normal"), (1000, "Preocupante"), (float("inf"), "Crítico")],
+    "C2H4": [(50, "Normal"), (500, "Preocupante"), (float("inf"), "Crítico")],
+    "C2H2": [(5, "Normal"), (35, "Preocupante"), (float("inf"), "Crítico")],
+    "TDGC": [(720, "Normal"), (1920, "Preocupante"), (float("inf"), "Crítico")],
+}
+LIMITES_IEC = {  # IEC 60599
+    "H2": [(100, "Normal"), (700, "Preocupante"), (float("inf"), "Crítico")],
+    "CH4": [(120, "Normal"), (1000, "Preocupante"), (float("inf"), "Crítico")],
+    "C2H6": [(65, "Normal"), (1000, "Preocupante"), (float("inf"), "Crítico")],
+    "C2H4": [(50, "Normal"), (1000, "Preocupante"), (float("inf"), "Crítico")],
+    "C2H2": [(3, "Normal"), (50, "Preocupante"), (float("inf"), "Crítico")],
+}
+
+# ================= GASES =================
+def _columna(df: pd.DataFrame, gas):
+    for c in ALIAS.get(gas, [gas]):
+        if c in df.columns:
+            return c
+    return None
+
+def tabla_gases(df: pd.DataFrame) -> pd.DataFrame:
+    """Llave, fecha y concentraciones como float (lo no numérico queda NaN)."""
+    df = df.rename(columns=lambda x: str(x).strip())
+    out = df[[c for c in KEY + ["Fecha de Muestra"] if c in df.columns]].copy()
+    for gas in GASES:
+        col = _columna(df, gas)
+        if col is not None:
+            out[gas] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    return out
+
+# ================= CLASIFICACIÓN =================
+def severidad(valores: np.ndarray, limites) -> np.ndarray:
+    """Índice en NIVELES de cada valor: el estado del primer límite >= valor, igual que
+    `estados.clasificar`; NaN (o por encima de todo) cuenta como Normal."""
+    cortes = np.maximum.accumulate(np.array([lim for lim, _ in limites], dtype="float64"))
+    niveles = np.array([NIVELES.index(e) for _, e in limites] + [0], dtype="int8")
+    # Con pocos cortes, contar los superados es más rápido que searchsorted (mismo resultado)
+    pos = np.zeros(len(valores), dtype="int8")
+    for c in cortes[np.isfinite(cortes)]:
+        np.add(pos, valores > c, out=pos, casting="unsafe")
+    if np.isinf(cortes[-1]) and np.array_equal(niveles[:-1], np.arange(len(cortes))):
+        return pos  # caso habitual Normal/Preocupante/Crítico; NaN no supera nada -> Normal
+    pos[np.isnan(valores)] = len(cortes)
+    return niveles[pos]
+
+def clasificar(gases: dict, limites: dict, n: int) -> np.ndarray:
+    """Peor nivel entre los gases disponibles, como `estado_global` / `diagnostico_iec`."""
+    sev = np.zeros(n, dtype="int8")
+    for gas, lims in limites.items():
+        if gas in gases:
+            np.maximum(sev, severidad(gases[gas], lims), out=sev)
+    return sev
+
+def etiquetas(sev: np.ndarray) -> np.ndarray:
+    return np.array(NIVELES, dtype=object)[sev]
+
+def diagnostico(df: pd.DataFrame, limites: dict) -> np.ndarray:
+    """Diagnóstico por fila de un DataFrame de muestras (vectorizado)."""
+    g = tabla_gases(df)
+    return etiquetas(clasificar({c: g[c].to_numpy() for c in GASES if c in g}, limites, len(df)))
+
+# ================= EXPORTAR / CARGAR =================
+def a_cortes(limites: dict) -> dict:
+    """{gas: [(lim, estado), ...]} -> {gas: [lim Normal, lim Preocupante]} (Crítico es el resto)."""
+    return {gas: [lim for lim, _ in lims if np.isfinite(lim)] for gas, lims in limites.items()}
+
+def desde_cortes(cortes: dict) -> dict:
+    return {gas: [(float(n), NIVELES[0]), (float(p), NIVELES[1]), (float("inf"), NIVELES[2])]
+            for gas, (n, p) in cortes.items()}
+
+def a_json(conjuntos: dict) -> str:
+    """{"IEEE": limites, "IEC": limites} -> JSON editable a mano."""
+    return json.dumps({k: a_cortes(v) for k, v in conjuntos.items()}, indent=2, ensure_ascii=False)
+
+def cargar(norma: str, defecto: dict, path=None) -> dict:
+    """Límites de `norma` con lo que haya en umbrales.json encima de los de fábrica."""
+    path = Path(path or UMBRALES_FILE)
+    if not path.exists():
+        return defecto
+    try:
+        contenido = json.loads(path.read_text(encoding="utf-8"))
+        if not isinstance(contenido, dict) or not isinstance(contenido.get(norma, {}), dict):
+            raise ValueError('se esperaba {"IEEE": {gas: [normal, preocupante]}, "IEC": {...}}')
+        cortes = contenido.get(norma, {})
+        propios = desde_cortes({g: c for g, c in cortes.items() if g in defecto})
+    except (ValueError, TypeError) as e:
+        print(f"⚠️ {path.name} inválido ({e}); se usan los límites {norma} de fábrica.")
+        return defecto
+    if propios:
+        print(f"⚙️ Límites {norma} desde {path.name}: {', '.join(propios)}")
+    return {**defecto, **propios}